@@ -0,0 +1,59 @@
+""" Ed25519 group arithmetic: extended coordinates on Python ints vs the Weierstrass form in Sage.
+    Usage: python bench/bench_ed25519.py [n]
+"""
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "Ed25519"))
+from Utils import Ed25519, EdDSA, Helper
+
+def bench(f, args):
+    st = time.perf_counter()
+    try:
+        res = [f(*a) for a in args]
+    except ImportError:
+        return None, None
+    return time.perf_counter() - st, res
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    scalars = [int.from_bytes(os.urandom(32), 'little') for _ in range(n)]
+    points  = [Ed25519.mult(Ed25519.BASE, k) for k in scalars]
+    Ed25519.base_table()
+
+    print(f"{'operation':>10} {'engine':>11} {'ops/s':>9}")
+    t, res = bench(Ed25519.base_mult, [(k,) for k in scalars])
+    assert res == points
+    print(f"{'base_mult':>10} {'comb':>11} {n / t:>9.0f}")
+    encodings = [Helper.EncodePoint(*P) for P in points]
+    Helper._decoded.clear()
+    t, res = bench(Helper.DecodePoint, [(s,) for s in encodings])
+    assert res == points
+    print(f"{'decode':>10} {'sqrt ratio':>11} {n / t:>9.0f}")
+    for name, ops in (
+        ("mult", [(Ed25519.mult, Ed25519.mult_weierstrass), [(Ed25519.BASE, k) for k in scalars]]),
+        ("add",  [(Ed25519.add, Ed25519.add_weierstrass), list(zip(points, points[1:] + points[:1]))]),
+    ):
+        (extended, weierstrass), args = ops
+        t0, ref = bench(extended, args)
+        print(f"{name:>10} {'extended':>11} {len(args) / t0:>9.0f}")
+        t1, res = bench(weierstrass, args)
+        if t1 is None:
+            print(f"{name:>10} {'weierstrass':>11} {'n/a':>9}")
+        else:
+            assert res == ref
+            print(f"{name:>10} {'weierstrass':>11} {len(args) / t1:>9.0f}")
+
+    keypair = EdDSA.create_keypair()
+    sk, vk  = keypair[:32], keypair[32:]
+    msgs = [(os.urandom(32), sk, vk) for _ in range(n)]
+    t, sigs = bench(EdDSA.sign_message, msgs)
+    print(f"{'sign':>10} {'extended':>11} {n / t:>9.0f}")
+    t, ok = bench(EdDSA.verify_signature, [(sig, m, vk) for sig, (m, _, _) in zip(sigs, msgs)])
+    assert all(ok)
+    print(f"{'verify':>10} {'extended':>11} {n / t:>9.0f}")
+    t, ok = bench(EdDSA.verify_batch, [([sig for sig in sigs], [m for m, _, _ in msgs], [vk] * n)])
+    assert all(ok[0])
+    print(f"{'verify':>10} {'batch':>11} {n / t:>9.0f}")
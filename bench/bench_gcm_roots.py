@@ -0,0 +1,45 @@
+""" H recovery of the AES-GCM forbidden attack: pure python `GF128` engine vs Sage.
+    Usage: python bench/bench_gcm_roots.py
+"""
+from Crypto.Cipher import AES
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "AEAD", "AES_GCM"))
+from Attack import nonce_reuse_many
+
+key   = os.urandom(16)
+nonce = os.urandom(12)
+H     = int.from_bytes(AES.new(key, AES.MODE_ECB).encrypt(bytes(16)), byteorder="big")
+
+def messages(n_messages: int, length: int):
+    res = []
+    for _ in range(n_messages):
+        ad = os.urandom(16)
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(ad)
+        ct, tag = cipher.encrypt_and_digest(os.urandom(length))
+        res.append((ct, ad, tag))
+    return res
+
+def bench(msgs, use_sage: bool):
+    st = time.perf_counter()
+    try:
+        roots = nonce_reuse_many(msgs, use_sage=use_sage)
+    except ImportError:
+        return None, None
+    return time.perf_counter() - st, roots
+
+if __name__ == "__main__":
+    print(f"{'messages':>8} {'length':>7} {'engine':>7} {'time (s)':>9} {'roots':>6}")
+    for n_messages, length in [(2, 64), (2, 256), (3, 256), (3, 4096), (8, 4096)]:
+        msgs = messages(n_messages, length)
+        for use_sage in (False, True):
+            t, roots = bench(msgs, use_sage)
+            name = "sage" if use_sage else "GF128"
+            if t is None:
+                print(f"{n_messages:>8} {length:>7} {name:>7} {'n/a':>9}")
+            else:
+                assert H in roots
+                print(f"{n_messages:>8} {length:>7} {name:>7} {t:>9.3f} {len(roots):>6}")
@@ -0,0 +1,47 @@
+""" Import time of every attack module, each one in a fresh interpreter (like our job runner does).
+    Usage: python bench/bench_import_time.py [repeat]
+"""
+import subprocess
+import sys
+import os
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+MODULES = [
+    ("AES", "DFA"),
+    ("AES", "SquareAttack"),
+    ("AEAD/AES_GCM", "Attack"),
+    ("AEAD/ChaChaPoly1305", "Attack"),
+    ("Curve", "CompositeCurve"),
+    ("Ed25519", "SignatureForgery"),
+    ("Hash/PythonHash", "PreimageAttackHashTuple"),
+    ("Lattice", "Knapsack.LowDensity"),
+    ("PRNG/nodejs", "Crack"),
+]
+PROBE = """
+import time, sys
+st = time.perf_counter()
+import {module}
+print(time.perf_counter() - st, "sage" in sys.modules)
+"""
+
+def bench(folder: str, module: str, repeat: int):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(SRC, folder), SRC]))
+    times, sage = [], None
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(module=module)],
+                             env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1]
+        t, sage = out.stdout.split()
+        times.append(float(t))
+    return min(times), sage == "True"
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'module':<45} {'import (ms)':>12} {'sage loaded':>12}")
+    for folder, module in MODULES:
+        t, sage = bench(folder, module, repeat)
+        if t is None:
+            print(f"{folder + '/' + module:<45} {'failed':>12}   {sage}")
+        else:
+            print(f"{folder + '/' + module:<45} {t * 1000:>12.1f} {str(sage):>12}")
@@ -0,0 +1,46 @@
+""" Poly1305: one multiply-mod-p per block (the original `poly1305`) vs the k-way `Poly1305` engine.
+    Usage: python bench/bench_poly1305.py
+"""
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "AEAD", "ChaChaPoly1305"))
+from Utils import Poly1305, poly1305_many
+
+def poly1305_serial(msg: bytes, key: bytes) -> bytes:
+    # the previous implementation, kept as the baseline
+    p = 2**130 - 5
+    r = int.from_bytes(key[:16], 'little') & 0x0ffffffc0ffffffc0ffffffc0fffffff
+    s = int.from_bytes(key[16:], 'little')
+    res = 0
+    for i in range(0, len(msg), 16):
+        res = (res + int.from_bytes(msg[i:i+16] + b'\x01', 'little')) * r % p
+    return ((res + s) % 2**128).to_bytes(16, 'little')
+
+def bench(f, *args):
+    st = time.perf_counter()
+    res = f(*args)
+    return time.perf_counter() - st, res
+
+if __name__ == "__main__":
+    key = os.urandom(32)
+
+    print(f"{'message':>10} {'engine':>10} {'MB/s':>8}")
+    for length in (64, 1 << 12, 1 << 20, 1 << 24):
+        msg = os.urandom(length)
+        t0, ref = bench(poly1305_serial, msg, key)
+        print(f"{length:>10} {'serial':>10} {length / t0 / 1e6:>8.1f}")
+        for ways in (4, 8, 16, 32):
+            t, tag = bench(lambda: Poly1305(key, ways=ways).update(msg).finalize())
+            assert tag == ref
+            print(f"{length:>10} {f'{ways}-way':>10} {length / t / 1e6:>8.1f}")
+
+    print(f"\n{'messages':>10} {'length':>7} {'engine':>10} {'time (s)':>9}")
+    for n_messages, length in ((10000, 64), (10000, 1024), (1000, 16384)):
+        msgs = [os.urandom(length) for _ in range(n_messages)]
+        t0, ref  = bench(lambda: [poly1305_serial(m, key) for m in msgs])
+        t1, tags = bench(poly1305_many, msgs, key)
+        assert tags == ref
+        print(f"{n_messages:>10} {length:>7} {'serial':>10} {t0:>9.3f}")
+        print(f"{n_messages:>10} {length:>7} {'batch':>10} {t1:>9.3f}")
@@ -1,6 +1,9 @@
 from typing import List, Tuple
-from sage.all import GF
+from multiprocessing import Pool
+import json
+from GF128 import from_gcm, to_gcm, poly_trim, poly_add, poly_gcd, poly_roots
 from Utils import *
+from Common import DATA_FORMAT, recover_keystream, KeystreamSession, SessionCache
 
 # modified from https://github.com/jvdsn/crypto-attacks/blob/master/attacks/gcm/forbidden_attack.py
 
@@ -15,91 +18,193 @@ def nonce_reuse(ct1: bytes, ad1: bytes, tag1: bytes,
     :param ct2: the ciphertext of the second message (bytes)
     :param ad2: the associated data of the second message (bytes)
     :param tag2: the authentication tag of the second message (bytes)
-    :return: All possible authentication keys (Field element)
+    :return: All possible authentication keys (Field element), see `nonce_reuse_many` for plain ints
     """
 
-    h  = F['h'].gen()
-    p1 = ghash(h, ad1, ct1) + int2field(int.from_bytes(tag1, byteorder="big"))
-    p2 = ghash(h, ad2, ct2) + int2field(int.from_bytes(tag2, byteorder="big"))
+    return [int2field(h) for h in nonce_reuse_many([(ct1, ad1, tag1), (ct2, ad2, tag2)])]
+
+def nonce_reuse_many(messages: List[Tuple[bytes,bytes,bytes]], use_sage: bool=False):
+    """
+    Recovers all possible authentication keys from all messages encrypted with the same authentication key.
+    Every P_i(h) = GHASH(h, a_i, c_i) + t_i takes the same value E0 at h = H, so H is a common root of all
+    the differences P_0 - P_i: their GCD has a tiny degree (usually 1 with three messages or more)
+    and only this GCD goes through root-finding.
+    :param messages: List of tuple (ciphertext, associated data, tag), at least two
+    :param use_sage: Use Sage's polynomials instead of the pure python engine of `GF128`
+    :return: All possible authentication keys (int, GCM bit order)
+    """
+
+    assert len(messages) > 1, "We need at least two!!"
+
+    if use_sage:
+        return _nonce_reuse_sage(messages)
+
+    # P_i in the polynomial basis, the coefficient of h^0 is the tag
+    ps = [
+        poly_trim([from_gcm(int.from_bytes(tag, byteorder="big"))] + [from_gcm(b) for b in ghash_blocks(ad, ct)[::-1]])
+        for ct, ad, tag in messages
+    ]
+
+    # shortest messages first, they give the smallest degrees
+    ps.sort(key=len)
+    g = []
+    for p in ps[1:]:
+        g = poly_gcd(g, poly_add(ps[0], p)) # gcd(0, f) = f
+        if 0 < len(g) <= 2:
+            break
+    assert g, "All messages are identical"
+
+    return [to_gcm(r) for r in poly_roots(g)]
+
+def _nonce_reuse_sage(messages: List[Tuple[bytes,bytes,bytes]]):
+    h  = gcm_field()['h'].gen()
+    ps = [ghash(h, ad, ct) + int2field(int.from_bytes(tag, byteorder="big")) for ct, ad, tag in messages]
+
+    ps.sort(key=lambda p: p.degree())
+    g = ps[0] - ps[0]
+    for p in ps[1:]:
+        g = g.gcd(ps[0] + p) # gcd(0, f) = f
+        if g != 0 and g.degree() <= 1:
+            break
+    assert g != 0, "All messages are identical"
 
     roots = []
-    for _h, r in (p1 + p2).roots():
-        roots.append(_h)    
+    for _h, r in g.roots():
+        roots.append(field2int(_h))
     return roots
 
-DATA_FORMAT = Tuple[bytes,bytes,bytes,bytes]
-def forgery_tag(known_data: List[DATA_FORMAT], target_ciphertext: bytes, 
-                   target_associated_data: bytes=b"") -> List[bytes]:
+def recover_keys(known_data: List[DATA_FORMAT]) -> List[Tuple[int,int]]:
+    """ All possible (H, E0) of the reused nonce, tag = GHASH(H, a, c) ^ E0 with E0 = E_K(J0)
+
+    :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
+    """
+
+    # We need at least two!!
+    assert len(known_data) > 1, "We need at least two!!"
+
+    _, ct, ad, tag = known_data[0]
+    roots = nonce_reuse_many([(ct, ad, tag) for _, ct, ad, tag in known_data])
+    return [(h, ghash_int(h, ad, ct) ^ int.from_bytes(tag, byteorder="big")) for h in roots]
+
+def _forgery_tags_chunk(args):
+    keys, targets = args
+    tags = [[] for _ in targets]
+    for h, E0 in keys:
+        for i, y in enumerate(ghash_powers(h).ghash_many([(ad, ct) for ct, ad in targets])):
+            tags[i].append((E0 ^ y).to_bytes(16, byteorder="big"))
+    return tags
+
+class NonceReuseSession(KeystreamSession):
+    """ Everything an attacker learns from one reused nonce: all possible (H, E0) and the keystream.
+        They are recovered once, then any number of tags/messages are forged without root-finding.
+    """
+    def __init__(self, keys: List[Tuple[int,int]], keystream: bytes=b""):
+        super().__init__(keystream)
+        self.keys = keys
+
+    @classmethod
+    def from_known_data(cls, known_data: List[DATA_FORMAT]):
+        """
+        :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
+        """
+        return cls(recover_keys(known_data), recover_keystream(known_data))
+
+    def forgery_tag(self, target_ciphertext, target_associated_data: bytes=b"") -> List[bytes]:
+        """ All possible tags of target_ciphertext (bytes-like or path of a file, streamed through mmap) """
+        # the target is read only once for all roots
+        hashers = [GHash(h, target_associated_data) for h, _ in self.keys]
+        chunks  = file_chunks(target_ciphertext) if isinstance(target_ciphertext, str) else [target_ciphertext]
+        for chunk in chunks:
+            for hasher in hashers:
+                hasher.update(chunk)
+
+        tags = []
+        for (h, E0), hasher in zip(self.keys, hashers):
+            tag = (E0 ^ hasher.finalize()).to_bytes(16, byteorder="big")
+            tags.append(tag)
+        return tags
+
+    def forgery_tags(self, targets: List[Tuple[bytes,bytes]], processes: int=None, chunk_size: int=4096) -> List[List[bytes]]:
+        """ Tags of all the (ciphertext, associated data) targets, see `forgery_tags` """
+        chunks = [(self.keys, targets[i:i+chunk_size]) for i in range(0, len(targets), chunk_size)]
+        if len(chunks) <= 1 or processes == 1:
+            results = map(_forgery_tags_chunk, chunks)
+            return [tags for res in results for tags in res]
+
+        with Pool(processes) as pool:
+            return [tags for res in pool.imap(_forgery_tags_chunk, chunks) for tags in res]
+
+    def save(self, path: str):
+        with open(path, "w") as fp:
+            json.dump({"keys": self.keys, "keystream": self.keystream.hex()}, fp)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path) as fp:
+            data = json.load(fp)
+        return cls([tuple(key) for key in data["keys"]], bytes.fromhex(data["keystream"]))
+
+# ===== Sessions cache =====
+# The sessions of the last SESSION_CACHE_SIZE nonces are kept in memory, and also on disk with `cache_dir`.
+
+SESSION_CACHE_SIZE = 64
+_sessions = SessionCache(NonceReuseSession, "gcm", SESSION_CACHE_SIZE)
+
+def get_session(nonce: bytes, known_data: List[DATA_FORMAT], cache_dir: str=None) -> NonceReuseSession:
+    """ The session of `nonce`, only recovered from known_data if it isn't in the cache yet
+
+    :param nonce: The reused nonce (any bytes identifying the GCM key/nonce pair)
+    :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
+    :param cache_dir: Optional directory where the sessions are persisted (one JSON file per nonce)
+    """
+    return _sessions.get_session(nonce, known_data, cache_dir)
+
+_session = _sessions.session
+
+def forgery_tag(known_data: List[DATA_FORMAT], target_ciphertext, 
+                   target_associated_data: bytes=b"", nonce: bytes=None, cache_dir: str=None) -> List[bytes]:
     """ Recover the GHASH key when nonce is reused
         then forgery a tag corressponding target_ciphertext with Associated Data
 
     :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
-    :param target_ciphertext: Target ciphertext that we want to forgery tag.
+    :param target_ciphertext: Target ciphertext that we want to forgery tag (bytes-like or path of a file,
+                              streamed through mmap).
     :param target_associated_data: Associated Data corressponding to target ciphertext.
+    :param nonce: The reused nonce, to recover the GHASH key only once (see `get_session`)
+    :param cache_dir: Optional directory where the recovered keys are persisted
     :return: All possible forged authentication tag
     """
 
-    # We need at least two!!
-    assert len(known_data) > 1, "We need at least two!!"
-    
-    # Step 1: Recover GHASH key
-    data1 = known_data[0]
-    data2 = known_data[1]
-    roots = nonce_reuse(ct1=data1[1], ad1=data1[2], tag1=data1[3],
-                        ct2=data2[1], ad2=data2[2], tag2=data2[3])
-    
-    # Step 2: Forgery Attack!
-    tags = []
-    for h in roots:
-        E0 = field2int(ghash(h, data1[2], data1[1])) ^ int.from_bytes(data1[3], byteorder="big")
-        target_ghash = ghash(h, target_associated_data, target_ciphertext)
-        tag = (E0 ^ field2int(target_ghash)).to_bytes(16, byteorder="big")
-        tags.append(tag)
-    
-    return tags
+    return _session(known_data, nonce, cache_dir).forgery_tag(target_ciphertext, target_associated_data)
 
 def forgery_message(known_data: List[DATA_FORMAT], target_plaintext: bytes, 
-                   target_associated_data: bytes=b"") -> Tuple[bytes, List[bytes]]:
+                   target_associated_data: bytes=b"", nonce: bytes=None, cache_dir: str=None) -> Tuple[bytes, List[bytes]]:
     """ Recover the GHASH key when nonce is reused
         then forgery a tag corressponding target_plaintext with Associated Data
 
     :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
     :param target_plaintext: Target plaintext that we want to forgery tag.
     :param target_associated_data: Associated Data corressponding to target plaintext.
+    :param nonce: The reused nonce, to recover the GHASH key only once (see `get_session`)
+    :param cache_dir: Optional directory where the recovered keys are persisted
     :return: Ciphertext and possible forged authentication tag
     """
 
-    # We need at least two!!
-    assert len(known_data) > 1, "We need at least two!!"
-    
-    xor = lambda msg1, msg2: bytes([m1^m2 for m1,m2 in zip(msg1, msg2)])
-    
-    # Step 1: Recover keystream
-    keystream = b""
-    for pt, ct, ad, tag in known_data:
-        if pt is not None:
-            key = xor(pt, ct)
-            if len(key) > len(keystream):
-                keystream = key
-    assert len(keystream) > 0, "Can't forgery if don't have keystream"
-
-
-    # Step 2: Recover GHASH key
-    data1 = known_data[0]
-    data2 = known_data[1]
-    # anyway just use the first key :<
-    roots = nonce_reuse(ct1=data1[1], ad1=data1[2], tag1=data1[3],
-                    ct2=data2[1], ad2=data2[2], tag2=data2[3])
-    
-    # Step 3: Forgery Attack!
-    assert len(keystream) >= len(target_plaintext), "Target plaintext too long"
-    target_ciphertext = xor(target_plaintext, keystream)
-
-    tags = []
-    for h in roots:
-        E0 = field2int(ghash(h, data1[2], data1[1])) ^ int.from_bytes(data1[3], byteorder="big")
-        target_ghash = ghash(h, target_associated_data, target_ciphertext)
-        tag = (E0 ^ field2int(target_ghash)).to_bytes(16, byteorder="big")
-        tags.append(tag)
-    
-    return target_ciphertext, tags
\ No newline at end of file
+    session = _session(known_data, nonce, cache_dir)
+    return session.forgery_message(target_plaintext, target_associated_data)
+
+def forgery_tags(known_data: List[DATA_FORMAT], targets: List[Tuple[bytes,bytes]],
+                   processes: int=None, chunk_size: int=4096, nonce: bytes=None, cache_dir: str=None) -> List[List[bytes]]:
+    """ Bulk version of `forgery_tag`: H and E0 are recovered once, then the tags of all the targets
+        are computed with the tables of the powers of H (`GHashPowers`), over a process pool for large batches
+
+    :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
+    :param targets: List of tuple (ciphertext, associated data) that we want to forgery tag.
+    :param processes: Number of workers (default: cpu count, 1 to stay in this process)
+    :param chunk_size: Number of targets per task
+    :param nonce: The reused nonce, to recover the GHASH key only once (see `get_session`)
+    :param cache_dir: Optional directory where the recovered keys are persisted
+    :return: For every target, all possible forged authentication tag (one per possible H)
+    """
+
+    return _session(known_data, nonce, cache_dir).forgery_tags(targets, processes, chunk_size)
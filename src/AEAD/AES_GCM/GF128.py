@@ -0,0 +1,148 @@
+import os
+
+# Sage-free arithmetic in GF(2^128)[h] (modulus of GCM), enough to find the roots of the forbidden attack polynomials.
+# Field elements are ints in the *polynomial basis* (bit i = coefficient of x^i), i.e. the bit-reversal
+# of the GCM representation (see `from_gcm`). Polynomials are lists of field elements, lowest degree first,
+# without trailing zeros (the zero polynomial is []).
+
+MASK    = (1 << 128) - 1
+MODULUS = (1 << 128) | 0x87 # x^128 + x^7 + x^2 + x + 1
+
+# ============================== GF(2^128) ==============================
+
+def from_gcm(n: int) -> int:
+    """ GCM bit order (coefficient of x^0 in the MSB) to polynomial basis, and back (it is an involution) """
+    return int(f"{n:0128b}"[::-1], 2)
+
+to_gcm = from_gcm
+
+def _reduce(p: int) -> int:
+    # x^128 = x^7 + x^2 + x + 1, twice is enough for a product of two elements
+    for _ in range(2):
+        hi = p >> 128
+        if not hi:
+            break
+        p = (p & MASK) ^ hi ^ (hi << 1) ^ (hi << 2) ^ (hi << 7)
+    return p
+
+def gf_mul(a: int, b: int) -> int:
+    """ Carry-less multiplication (4-bit window) followed by the reduction """
+    if a.bit_length() < b.bit_length():
+        a, b = b, a
+    table = [0] * 16
+    for i in range(1, 16):
+        table[i] = (table[i >> 1] << 1) ^ (a if i & 1 else 0)
+
+    res = 0
+    for shift in range((b.bit_length() + 3) // 4 * 4 - 4, -4, -4):
+        res = (res << 4) ^ table[(b >> shift) & 15]
+    return _reduce(res)
+
+# spreading the bits of a byte: squaring is linear in characteristic 2
+_SPREAD = [int(f"{b:08b}".replace("", "0")[:-1], 2) for b in range(256)]
+
+def gf_sqr(a: int) -> int:
+    res, shift = 0, 0
+    while a:
+        res |= _SPREAD[a & 0xff] << shift
+        a >>= 8
+        shift += 16
+    return _reduce(res)
+
+def gf_inv(a: int) -> int:
+    """ Extended Euclid in GF(2)[x] """
+    assert a != 0, "0 has no inverse"
+    u, v, g1, g2 = a, MODULUS, 1, 0
+    while u != 1:
+        j = u.bit_length() - v.bit_length()
+        if j < 0:
+            u, v, g1, g2, j = v, u, g2, g1, -j
+        u  ^= v << j
+        g1 ^= g2 << j
+    return _reduce(g1)
+
+# =========================== GF(2^128)[h] ===========================
+
+def poly_trim(f: list) -> list:
+    while f and not f[-1]:
+        f.pop()
+    return f
+
+def poly_add(f: list, g: list) -> list:
+    if len(f) < len(g):
+        f, g = g, f
+    res = f[:]
+    for i, c in enumerate(g):
+        res[i] ^= c
+    return poly_trim(res)
+
+def poly_monic(f: list) -> list:
+    inv = gf_inv(f[-1])
+    return [gf_mul(c, inv) for c in f[:-1]] + [1]
+
+def poly_divmod(f: list, g: list):
+    """ Quotient and remainder of f / g (g != 0) """
+    assert g, "Division by zero polynomial"
+    rem, dg = f[:], len(g) - 1
+    inv = gf_inv(g[-1])
+    quo = [0] * max(len(f) - dg, 0)
+    for i in range(len(f) - 1, dg - 1, -1):
+        c = rem[i]
+        if not c:
+            continue
+        c = gf_mul(c, inv)
+        quo[i - dg] = c
+        for j in range(dg):
+            if g[j]:
+                rem[i - dg + j] ^= gf_mul(c, g[j])
+        rem[i] = 0
+    return poly_trim(quo), poly_trim(rem[:dg])
+
+def poly_mod(f: list, g: list) -> list:
+    return poly_divmod(f, g)[1]
+
+def poly_gcd(f: list, g: list) -> list:
+    """ Monic GCD (gcd(0, f) = f) """
+    while g:
+        f, g = g, poly_mod(f, g)
+    return poly_monic(f) if f else []
+
+def poly_sqrmod(f: list, g: list) -> list:
+    res = [0] * (2 * len(f) - 1) if f else []
+    for i, c in enumerate(f):
+        res[2 * i] = gf_sqr(c)
+    return poly_mod(res, g)
+
+def poly_roots(f: list) -> list:
+    """ All distinct roots of f in GF(2^128) (Cantor–Zassenhaus)
+        1. distinct-degree: the roots are those of gcd(f, h^(2^128) - h)
+        2. equal-degree: split with gcd(g, Tr(d*h)), Tr(y) = y + y^2 + ... + y^(2^127), for random d
+    """
+    f = poly_trim(f[:])
+    if len(f) <= 1:
+        return []
+    f = poly_monic(f)
+
+    # h^(2^128) mod f
+    hq = poly_mod([0, 1], f)
+    for _ in range(128):
+        hq = poly_sqrmod(hq, f)
+    return _split_linear(poly_gcd(f, poly_add(hq, [0, 1])))
+
+def _split_linear(g: list) -> list:
+    # g is monic and a product of distinct linear factors
+    if len(g) <= 1:
+        return []
+    if len(g) == 2:
+        return [g[0]] # h + c -> root c (characteristic 2)
+
+    while True:
+        delta = int.from_bytes(os.urandom(16), "big")
+        y = poly_mod([0, delta], g)
+        trace = y
+        for _ in range(127):
+            y = poly_sqrmod(y, g)
+            trace = poly_add(trace, y)
+        d = poly_gcd(g, trace)
+        if 1 < len(d) < len(g):
+            return _split_linear(d) + _split_linear(poly_divmod(g, d)[0])
@@ -1,13 +1,28 @@
-from sage.all import GF
+from functools import lru_cache
+import numpy as np
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from Common import file_chunks
 
 # modified from https://github.com/jvdsn/crypto-attacks/blob/master/attacks/gcm/forbidden_attack.py
-x = GF(2)["x"].gen()
-F = GF(2 ** 128, name="y", modulus=x ** 128 + x ** 7 + x ** 2 + x + 1)
+
+# The GCM field is only built (and Sage only imported) when it is actually needed.
+@lru_cache(maxsize=None)
+def gcm_field():
+    from sage.all import GF
+    x = GF(2)["x"].gen()
+    return GF(2 ** 128, name="y", modulus=x ** 128 + x ** 7 + x ** 2 + x + 1)
 
 
 # Converts an integer to a field element, little endian.
 def int2field(n: int):
-    return F([(n >> i) & 1 for i in range(127, -1, -1)])
+    return gcm_field()([(n >> i) & 1 for i in range(127, -1, -1)])
+
+# Reverses the 128 bits of an integer (GCM stores the coefficient of x^0 in the MSB).
+def reverse128(n: int) -> int:
+    return int(f"{n:0128b}"[::-1], 2)
 
 # Converts a field element to an integer, little endian.
 def field2int(f):
@@ -17,13 +32,9 @@ def field2int(f):
     n = f.to_integer()  # big endian
 
     # convert to little endian
-    res = 0
-    for i in range(128):
-        res <<= 1
-        res  |= ((n >> i) & 1)
-    return res
+    return reverse128(int(n))
 
-# Calculates the AES-GCM GHASH polynomial.
+# Calculates the AES-GCM GHASH polynomial (h is a symbolic polynomial or a field element).
 def ghash(h, a: bytes, c: bytes):
     la  = len(a) # Associated Data length
     lc  = len(c) # Ciphertext length
@@ -55,4 +66,174 @@ def ghash(h, a: bytes, c: bytes):
     res += int2field(((8 * la) << 64) | (8 * lc))
     res *= h
 
-    return res
\ No newline at end of file
+    return res
+
+# The padded blocks of the associated data, the ciphertext and the length block (GCM ints):
+# GHASH(h, a, c) = blocks[0] * h^n + blocks[1] * h^(n-1) + ... + blocks[n-1] * h
+def ghash_blocks(a: bytes, c: bytes) -> list:
+    blocks = []
+    for data in (a, c):
+        for i in range(0, len(data), 16):
+            blocks.append(int.from_bytes(bytes(data[i:i+16]).ljust(16, b"\x00"), byteorder="big"))
+    blocks.append(((8 * len(a)) << 64) | (8 * len(c)))
+    return blocks
+
+# =========================== Integer GHASH ===========================
+# Once H is known, GHASH is computed on plain Python ints (GCM bit order) without Sage.
+
+R = 0xE1 << 120 # x^128 = x^7 + x^2 + x + 1, reflected
+
+def gf128_mul(x: int, y: int) -> int:
+    """ Bit by bit multiplication in GF(2^128), NIST SP 800-38D Algorithm 1 """
+    z, v = 0, y
+    for i in range(127, -1, -1):
+        if (x >> i) & 1:
+            z ^= v
+        v = (v >> 1) ^ R if v & 1 else v >> 1
+    return z
+
+@lru_cache(maxsize=64)
+def ghash_table(h: int) -> tuple:
+    """ Shoup-style 8-bit tables of a fixed H: table[j][b] = (b << 8*(15-j)) * H
+        so that X * H = table[0][X_0] ^ table[1][X_1] ^ ... ^ table[15][X_15] (X_j is the j-th byte of X)
+    """
+    # H * x^i for i = 0..127 (the bit 127 - i of the int)
+    powers = [h]
+    for _ in range(127):
+        v = powers[-1]
+        powers.append((v >> 1) ^ R if v & 1 else v >> 1)
+
+    table = []
+    for j in range(16):
+        row = [0] * 256
+        for k in range(7, -1, -1):
+            bit, hx = 1 << (7 - k), powers[8 * j + k]
+            for b in range(bit):
+                row[b | bit] = row[b] ^ hx
+        table.append(tuple(row))
+    return tuple(table)
+
+def ghash_update(table: tuple, y: int, data: bytes) -> int:
+    """ Absorb `data` (zero padded to a multiple of 16 bytes) into the GHASH state y """
+    t0, t1, t2, t3, t4, t5, t6, t7, t8, t9, t10, t11, t12, t13, t14, t15 = table
+    for i in range(0, len(data), 16):
+        block = data[i:i+16]
+        if len(block) < 16:
+            block = bytes(block) + bytes(16 - len(block))
+        x0, x1, x2, x3, x4, x5, x6, x7, x8, x9, x10, x11, x12, x13, x14, x15 = \
+            (y ^ int.from_bytes(block, byteorder="big")).to_bytes(16, byteorder="big")
+        y = t0[x0] ^ t1[x1] ^ t2[x2] ^ t3[x3] ^ t4[x4] ^ t5[x5] ^ t6[x6] ^ t7[x7] ^ \
+            t8[x8] ^ t9[x9] ^ t10[x10] ^ t11[x11] ^ t12[x12] ^ t13[x13] ^ t14[x14] ^ t15[x15]
+    return y
+
+class GHash:
+    """ Incremental GHASH of a known H: GHash(h, a).update(c1).update(c2)...finalize() == ghash_int(h, a, c1 + c2 + ...)
+        Chunks can be any buffer (bytes, memoryview, mmap), full blocks are read in place, only the
+        (< 16 bytes) tail of a chunk is kept between two updates.
+    """
+    def __init__(self, h: int, a: bytes=b""):
+        self.table = ghash_table(h)
+        self.y     = ghash_update(self.table, 0, memoryview(a))
+        self.la    = len(a)
+        self.lc    = 0
+        self.tail  = b""
+
+    def update(self, c):
+        c = memoryview(c).cast("B")
+        self.lc += len(c)
+        if self.tail:
+            need = 16 - len(self.tail)
+            self.tail += bytes(c[:need])
+            c = c[need:]
+            if len(self.tail) < 16:
+                return self
+            self.y, self.tail = ghash_update(self.table, self.y, self.tail), b""
+        full = len(c) - len(c) % 16
+        self.y    = ghash_update(self.table, self.y, c[:full])
+        self.tail = bytes(c[full:])
+        return self
+
+    def finalize(self) -> int:
+        y = ghash_update(self.table, self.y, self.tail)
+        return ghash_update(self.table, y, (((8 * self.la) << 64) | (8 * self.lc)).to_bytes(16, byteorder="big"))
+
+def ghash_int(h: int, a: bytes, c: bytes) -> int:
+    """ Same as `ghash` (result already converted by `field2int`) for a known H given as an int """
+    return GHash(h, a).update(c).finalize()
+
+# ====================== GHASH with the powers of H ======================
+# GHASH(h, a, c) = X_1 * H^n ^ X_2 * H^(n-1) ^ ... ^ X_n * H: with one 8-bit table per power of H the products
+# don't depend on each other anymore, so a whole batch of messages with n blocks is a single numpy gather.
+
+def _u64_pairs(values: list):
+    return np.array([(v >> 64, v & 0xffffffffffffffff) for v in values], dtype=np.uint64)
+
+def power_table(p: int):
+    """ Same as ghash_table(p) as a uint64 array of shape (16, 256, 2) (high and low halves) """
+    basis = [p]
+    for _ in range(127):
+        v = basis[-1]
+        basis.append((v >> 1) ^ R if v & 1 else v >> 1)
+    basis = _u64_pairs(basis).reshape(16, 8, 2)
+
+    table = np.zeros((16, 256, 2), dtype=np.uint64)
+    for t in range(8):
+        table[:, 1 << t:2 << t] = table[:, :1 << t] ^ basis[:, 7 - t, None, :]
+    return table
+
+GHASH_MAX_BLOCKS = 256
+
+class GHashPowers:
+    """ Tables of H^1, H^2, ... (64 KiB each, built on demand) to evaluate GHASH as a dot product
+        of the blocks and the powers of H, for many messages at once.
+        At most `max_blocks` tables are built (16 MiB by default), longer messages fall back to `ghash_int`.
+    """
+    def __init__(self, h: int, max_blocks: int=GHASH_MAX_BLOCKS):
+        self.h          = h
+        self.max_blocks = max_blocks
+        self.powers     = [h]
+        self.tables     = np.zeros((0, 16, 256, 2), dtype=np.uint64)
+
+    def _extend(self, n: int):
+        table = ghash_table(self.h)
+        while len(self.powers) < n:
+            self.powers.append(ghash_update(table, 0, self.powers[-1].to_bytes(16, byteorder="big")))
+        self.tables = np.concatenate([self.tables] + [power_table(p)[None] for p in self.powers[len(self.tables):n]])
+
+    def ghash_many(self, messages: list, max_gather: int=1 << 21) -> list:
+        """ [ghash_int(h, a, c) for a, c in messages]
+        :param messages: List of tuple (associated data, ciphertext)
+        :param max_gather: Number of (block, byte) lookups done by one numpy gather (32 bytes each)
+        """
+        res    = [None] * len(messages)
+        groups = {}
+        for i, (a, c) in enumerate(messages):
+            n = -(-len(a) // 16) - (-len(c) // 16) + 1
+            if n > self.max_blocks:
+                res[i] = ghash_int(self.h, a, c)
+            else:
+                groups.setdefault(n, []).append(i)
+
+        for n, idxs in groups.items():
+            if len(self.tables) < n:
+                self._extend(n)
+            tables = self.tables[n-1::-1]  # the i-th block is multiplied by H^(n-i)
+            blocks = np.frombuffer(b"".join(
+                bytes(a).ljust(-(-len(a) // 16) * 16, b"\x00") + bytes(c).ljust(-(-len(c) // 16) * 16, b"\x00") +
+                (((8 * len(a)) << 64) | (8 * len(c))).to_bytes(16, byteorder="big")
+                for a, c in (messages[i] for i in idxs)
+            ), dtype=np.uint8).reshape(len(idxs), n, 16)
+
+            rows = max(1, max_gather // (16 * n))
+            pos, byte = np.arange(n)[:, None], np.arange(16)[None, :]
+            for st in range(0, len(idxs), rows):
+                prods = tables[pos, byte, blocks[st:st+rows]]  # (rows, n, 16, 2)
+                y = np.bitwise_xor.reduce(prods.reshape(len(prods), -1, 2), axis=1)
+                for i, (hi, lo) in zip(idxs[st:st+rows], y.tolist()):
+                    res[i] = (hi << 64) | lo
+        return res
+
+# only the tables of the last H are kept, a nonce reuse almost always leaves a single candidate
+@lru_cache(maxsize=2)
+def ghash_powers(h: int) -> GHashPowers:
+    return GHashPowers(h)
@@ -1,6 +1,15 @@
-from sage.all import GF, PolynomialRing
 from typing import List, Tuple
+from multiprocessing import Pool
+import json
+from GF1305 import P, poly_sub, poly_mod, poly_gcd, poly_eval, poly_roots
 from Utils import *
+from Common import DATA_FORMAT, recover_keystream, KeystreamSession, SessionCache
+
+# t = (P(r) mod p + s) mod 2^128 with P(r) mod p + s < p + 2^128 < 5 * 2^128:
+# P(r) + s = t + d * 2^128 (mod p) for some d in [0, 5), and the difference of two messages only depends on d_i - d_j
+# (most likely first)
+OFFSETS = range(5)
+DELTAS  = (0, -1, 1, -2, 2, -3, 3, -4, 4)
 
 def nonce_reuse(ct1: bytes, ad1: bytes, tag1: bytes,
                 ct2: bytes, ad2: bytes, tag2: bytes) -> List[Tuple[int,int]]:
@@ -11,108 +20,179 @@ def nonce_reuse(ct1: bytes, ad1: bytes, tag1: bytes,
     :return: The list contains all possible values of (r,s)
     """
 
-    # Step 1: Define PolynomialRing
-    Fp = GF(2**130 - 5)
-    PR = PolynomialRing(Fp, names="x"); x = PR.gen()
-
-    # Step 2: Construct the polynomial
-    f1 = x * PR(construct_chacha_poly1305_coeffs(ciphertext=ct1, associated_data=ad1)[::-1])
-    t1 = int.from_bytes(tag1, byteorder='little')
-    f2 = x * PR(construct_chacha_poly1305_coeffs(ciphertext=ct2, associated_data=ad2)[::-1])
-    t2 = int.from_bytes(tag2, byteorder='little')
-
-    # Step 3: Same nonce -> Same root `r`
-    roots = []
-    isvalid_r = lambda r: int(r) == int(r) & 0x0ffffffc0ffffffc0ffffffc0fffffff
-    isvalid_s = lambda s: int(s) == int(s) & 0xffffffffffffffffffffffffffffffff
-    in_mod, ou_mod = 2**130-5, 2**128
-
-    # since t = (f%in_mod + s)%ou_mod
-    for di in range(0, in_mod + ou_mod, ou_mod):
-        for dj in range(0, in_mod + ou_mod, ou_mod):
-            fr = (t1 + di - f1) - (t2 + dj - f2)
-            for r, _ in fr.roots():
-                if isvalid_r(r):
-                    s1 = t1 + di - int(f1(x=r))
-                    s2 = t2 + dj - int(f2(x=r))
-                    if s1 == s2 and isvalid_s(s1):
-                        roots.append((int(r),int(s1)))
-    return roots
-
-DATA_FORMAT = Tuple[bytes,bytes,bytes,bytes]
-def forgery_tag(known_data: List[DATA_FORMAT], target_ciphertext: bytes, 
-                   target_associated_data: bytes=b"") -> bytes:
+    return nonce_reuse_many([(ct1, ad1, tag1), (ct2, ad2, tag2)])
+
+def _difference(p0: list, pj: list, t0: int, tj: int, delta: int) -> list:
+    # P_0(x) - P_j(x) - (t_0 - t_j + delta * 2^128), the constant term of P is 0
+    return poly_sub(poly_sub(p0, pj), [(t0 - tj + delta * 2**128) % P])
+
+def _reduced_roots(ps: list, ts: list, delta: int) -> list:
+    g = _difference(ps[0], ps[1], ts[0], ts[1], delta)
+    for pj, tj in zip(ps[2:], ts[2:]):
+        if len(g) <= 2:
+            break
+        # the right offset of message j keeps the root r, the wrong ones (almost always) leave a constant:
+        # no offset at all means that delta is wrong, no need to find the roots
+        gcds = [poly_gcd(g, poly_mod(_difference(ps[0], pj, ts[0], tj, dj), g)) for dj in DELTAS]
+        gcds = [d for d in gcds if len(d) > 1]
+        if not gcds:
+            return []
+        if len(gcds) == 1:
+            g = gcds[0]
+    return poly_roots(g)
+
+def _reduced_roots_sage(ps: list, ts: list, delta: int) -> list:
+    from sage.all import GF, PolynomialRing
+    PR = PolynomialRing(GF(P), names="x")
+    g  = PR(_difference(ps[0], ps[1], ts[0], ts[1], delta))
+    for pj, tj in zip(ps[2:], ts[2:]):
+        if g.degree() <= 1:
+            break
+        gcds = [g.gcd(PR(_difference(ps[0], pj, ts[0], tj, dj))) for dj in DELTAS]
+        gcds = [d for d in gcds if d.degree() > 0]
+        if not gcds:
+            return []
+        if len(gcds) == 1:
+            g = gcds[0]
+    return [int(r) for r, _ in g.roots()] if g.degree() > 0 else []
+
+def _nonce_reuse_task(args):
+    """ Worker: roots of the difference of the two first messages for one offset delta,
+        reduced by GCD with the other messages, then checked against all the messages
+    """
+    ps, ts, delta, use_sage = args
+    roots = (_reduced_roots_sage if use_sage else _reduced_roots)(ps, ts, delta)
+
+    keys = []
+    for r in roots:
+        if r != r & R_CLAMP:
+            continue
+        for d0 in OFFSETS:
+            s = (ts[0] + d0 * 2**128 - poly_eval(ps[0], r)) % P
+            if s < 2**128 and all((poly_eval(pj, r) + s) % 2**128 == tj for pj, tj in zip(ps[1:], ts[1:])):
+                keys.append((r, s))
+    return keys
+
+def nonce_reuse_many(messages: List[Tuple[bytes,bytes,bytes]], use_sage: bool=False,
+                     processes: int=1) -> List[Tuple[int,int]]:
+    """ Recover the ChaCha_Poly1305's keys from all the messages encrypted with the same nonce.
+        For every offset of the two shortest messages (9 tasks, optionally over a process pool), the degree of their
+        difference is reduced by GCD with the other messages before root-finding, and the candidates are
+        checked against all the messages: the first offset giving a valid (r, s) stops the search.
+    :param messages: List of tuple (ciphertext, associated data, tag), at least two
+    :param use_sage: Use Sage's polynomials instead of the pure python engine of `GF1305`
+    :param processes: Number of workers (default: 1 to stay in this process, None for cpu count).
+                      A pool only pays off for long messages, the first offset is almost always the right one.
+    :return: The list contains all possible values of (r,s)
+    """
+
+    messages = list(dict.fromkeys((bytes(ct), bytes(ad), bytes(tag)) for ct, ad, tag in messages))
+    assert len(messages) > 1, "We need at least two different messages!!"
+
+    # P(x) = c_1 * x^n + ... + c_n * x, shortest messages first, they give the smallest degrees
+    messages.sort(key=lambda m: len(m[0]) + len(m[1]))
+    ps = [[0] + construct_chacha_poly1305_coeffs(ciphertext=ct, associated_data=ad)[::-1] for ct, ad, _ in messages]
+    ts = [int.from_bytes(tag, byteorder='little') for _, _, tag in messages]
+
+    tasks = [(ps, ts, delta, use_sage) for delta in DELTAS]
+    if processes == 1:
+        for keys in map(_nonce_reuse_task, tasks):
+            if keys:
+                return keys
+        return []
+
+    with Pool(processes) as pool:
+        for keys in pool.imap_unordered(_nonce_reuse_task, tasks):
+            if keys:
+                return keys
+    return []
+
+class NonceReuseSession(KeystreamSession):
+    """ Everything an attacker learns from one reused nonce: the Poly1305 key (r, s) and the keystream.
+        They are recovered once, then any number of tags/messages are forged without root-finding.
+    """
+    def __init__(self, r: int, s: int, keystream: bytes=b""):
+        super().__init__(keystream)
+        self.r, self.s = r, s
+
+    @property
+    def rs(self) -> bytes:
+        return int(self.r).to_bytes(length=16, byteorder='little') + int(self.s).to_bytes(length=16, byteorder='little')
+
+    @classmethod
+    def from_known_data(cls, known_data: List[DATA_FORMAT], processes: int=1):
+        """
+        :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
+        :param processes: Number of workers of `nonce_reuse_many`
+        """
+        # We need at least two!!
+        assert len(known_data) > 1, "We need at least two!!"
+
+        # anyway just use the first key :<
+        r,s = nonce_reuse_many([(ct, ad, tag) for _, ct, ad, tag in known_data], processes=processes)[0]
+        return cls(r, s, recover_keystream(known_data))
+
+    def forgery_tag(self, target_ciphertext, target_associated_data: bytes=b"") -> bytes:
+        """ Tag of target_ciphertext (bytes-like or path of a file, streamed through mmap) """
+        chunks = file_chunks(target_ciphertext) if isinstance(target_ciphertext, str) else [target_ciphertext]
+        return chacha_poly1305_tag(self.rs, chunks, target_associated_data)
+
+    def save(self, path: str):
+        with open(path, "w") as fp:
+            json.dump({"r": self.r, "s": self.s, "keystream": self.keystream.hex()}, fp)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path) as fp:
+            data = json.load(fp)
+        return cls(data["r"], data["s"], bytes.fromhex(data["keystream"]))
+
+# ===== Sessions cache =====
+# The sessions of the last SESSION_CACHE_SIZE nonces are kept in memory, and also on disk with `cache_dir`.
+
+SESSION_CACHE_SIZE = 64
+_sessions = SessionCache(NonceReuseSession, "chacha", SESSION_CACHE_SIZE)
+
+def get_session(nonce: bytes, known_data: List[DATA_FORMAT], cache_dir: str=None) -> NonceReuseSession:
+    """ The session of `nonce`, only recovered from known_data if it isn't in the cache yet
+
+    :param nonce: The reused nonce (any bytes identifying the ChaCha20 key/nonce pair)
+    :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
+    :param cache_dir: Optional directory where the sessions are persisted (one JSON file per nonce)
+    """
+    return _sessions.get_session(nonce, known_data, cache_dir)
+
+_session = _sessions.session
+
+def forgery_tag(known_data: List[DATA_FORMAT], target_ciphertext, 
+                   target_associated_data: bytes=b"", nonce: bytes=None, cache_dir: str=None) -> bytes:
     """ Recover the Chacha-Poly1305 key when nonce is reused
         then forgery arbitrary message with Associated Data
 
     :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
-    :param target_ciphertext: Target ciphertext that we want to forgery.
+    :param target_ciphertext: Target ciphertext that we want to forgery (bytes-like or path of a file,
+                              streamed through mmap).
     :param target_associated_data: Associated Data corressponding to target plaintext.
+    :param nonce: The reused nonce, to recover the Poly1305 key only once (see `get_session`)
+    :param cache_dir: Optional directory where the recovered keys are persisted
     :return: The authentication tag that can be decrypted with ChaCha_Poly1305(same nonce)
     """
 
-    # We need at least two!!
-    assert len(known_data) > 1, "We need at least two!!"
-
-    # Step 1: Recover poly1305's key
-    data1 = known_data[0]
-    data2 = known_data[1]
-    # anyway just use the first key :<
-    r,s = nonce_reuse(ct1=data1[1], ad1=data1[2], tag1=data1[3],
-                        ct2=data2[1], ad2=data2[2], tag2=data2[3])[0]
-    rs  = int(r).to_bytes(length=16, byteorder='little') +\
-          int(s).to_bytes(length=16, byteorder='little')
-
-    # Step 2: Forgery Attack!
-    target_tag = poly1305(
-        msg=construct_chacha_poly1305_auth_msg(target_ciphertext, target_associated_data),
-        key=rs
-    )
-    
-    return target_tag
+    return _session(known_data, nonce, cache_dir).forgery_tag(target_ciphertext, target_associated_data)
 
 def forgery_message(known_data: List[DATA_FORMAT], target_plaintext: bytes, 
-                   target_associated_data: bytes=b"") -> Tuple[bytes, bytes]:
+                   target_associated_data: bytes=b"", nonce: bytes=None, cache_dir: str=None) -> Tuple[bytes, bytes]:
     """ Recover the Chacha-Poly1305 key when nonce is reused
         then forgery arbitrary message with Associated Data
 
     :param known_data: List of tuple (plaintext (if known else None), ciphertext, associated data, tag).
     :param target_plaintext: Target plaintext that we want to forgery.
     :param target_associated_data: Associated Data corressponding to target plaintext.
+    :param nonce: The reused nonce, to recover the Poly1305 key only once (see `get_session`)
+    :param cache_dir: Optional directory where the recovered keys are persisted
     :return: Tuple contain ciphertext and tag that can be decrypted with ChaCha_Poly1305(same nonce) 
             and result edexpected target_plaintext
     """
 
-    # We need at least two!!
-    assert len(known_data) > 1, "We need at least two!!"
-
-    xor = lambda msg1, msg2: bytes([m1^m2 for m1,m2 in zip(msg1, msg2)])
-
-    # Step 1: Recover keystream and chose the longest
-    keystream = b""
-    for pt, ct, ad, tag in known_data:
-        if pt is not None:
-            key = xor(pt, ct)
-            if len(key) > len(keystream):
-                keystream = key
-    assert len(keystream) > 0, "Can't forgery if don't have keystream"
-
-    # Step 2: Recover poly1305's key
-    data1 = known_data[0]
-    data2 = known_data[1]
-    # anyway just use the first key :<
-    r,s = nonce_reuse(ct1=data1[1], ad1=data1[2], tag1=data1[3],
-                        ct2=data2[1], ad2=data2[2], tag2=data2[3])[0]
-    rs  = int(r).to_bytes(length=16, byteorder='little') +\
-          int(s).to_bytes(length=16, byteorder='little')
-
-    # Step 3: Forgery Attack!
-    assert len(keystream) >= len(target_plaintext), "Target plaintext too long"
-    
-    target_ciphertext = xor(target_plaintext, keystream)
-    target_tag = poly1305(
-        msg=construct_chacha_poly1305_auth_msg(target_ciphertext, target_associated_data),
-        key=rs
-    )
-    
-    return target_ciphertext, target_tag
\ No newline at end of file
+    session = _session(known_data, nonce, cache_dir)
+    return session.forgery_message(target_plaintext, target_associated_data)
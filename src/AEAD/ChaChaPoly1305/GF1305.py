@@ -0,0 +1,137 @@
+import os
+
+# Sage-free arithmetic in GF(p)[x], p = 2^130 - 5, enough to find the roots of the Poly1305 nonce reuse polynomials.
+# Polynomials are lists of ints in [0, p), lowest degree first, without trailing zeros (the zero polynomial is []).
+# Products use Kronecker substitution (one Python big-int product), so that squarings modulo a polynomial
+# of degree n cost a few big-int products instead of O(n^2) Python operations.
+
+P = 2**130 - 5
+
+def poly_trim(f: list) -> list:
+    while f and not f[-1]:
+        f.pop()
+    return f
+
+def poly_sub(f: list, g: list) -> list:
+    res = f + [0] * (len(g) - len(f))
+    for i, c in enumerate(g):
+        res[i] = (res[i] - c) % P
+    return poly_trim(res)
+
+def poly_monic(f: list) -> list:
+    inv = pow(f[-1], -1, P)
+    return [c * inv % P for c in f[:-1]] + [1]
+
+def poly_eval(f: list, x: int) -> int:
+    res = 0
+    for c in reversed(f):
+        res = (res * x + c) % P
+    return res
+
+def poly_divmod(f: list, g: list):
+    """ Quotient and remainder of f / g (g != 0), schoolbook """
+    assert g, "Division by zero polynomial"
+    rem, dg = f[:], len(g) - 1
+    inv = pow(g[-1], -1, P)
+    quo = [0] * max(len(f) - dg, 0)
+    for i in range(len(f) - 1, dg - 1, -1):
+        c = rem[i] * inv % P
+        if not c:
+            continue
+        quo[i - dg] = c
+        for j in range(dg):
+            rem[i - dg + j] = (rem[i - dg + j] - c * g[j]) % P
+    return poly_trim(quo), poly_trim(rem[:dg])
+
+def poly_mod(f: list, g: list) -> list:
+    return poly_divmod(f, g)[1]
+
+def poly_gcd(f: list, g: list) -> list:
+    """ Monic GCD (gcd(0, f) = f) """
+    while g:
+        f, g = g, poly_mod(f, g)
+    return poly_monic(f) if f else []
+
+# ========================= Kronecker products =========================
+
+def poly_mul(f: list, g: list) -> list:
+    if not f or not g:
+        return []
+    # a coefficient of the product is a sum of min(len) products < p^2
+    size = (2 * P.bit_length() + min(len(f), len(g)).bit_length() + 8) // 8
+    pack = lambda h: int.from_bytes(b"".join(c.to_bytes(size, "little") for c in h), "little")
+
+    n   = len(f) + len(g) - 1
+    buf = (pack(f) * pack(g)).to_bytes(size * n, "little")
+    return poly_trim([int.from_bytes(buf[i:i+size], "little") % P for i in range(0, size * n, size)])
+
+def _truncate(f: list, k: int) -> list:
+    return poly_trim(f[:k])
+
+def _series_inverse(h: list, k: int) -> list:
+    # 1 / h mod x^k (h[0] = 1) by Newton iteration: g <- g * (2 - h * g)
+    g, prec = [1], 1
+    while prec < k:
+        prec = min(2 * prec, k)
+        e = poly_sub([2], _truncate(poly_mul(_truncate(h, prec), g), prec))
+        g = _truncate(poly_mul(g, e), prec)
+    return g
+
+class Reducer:
+    """ Reduction modulo a fixed monic f of degree n (Barrett): two products per reduction """
+    def __init__(self, f: list):
+        self.f = f
+        self.n = len(f) - 1
+        self.inv = _series_inverse(f[::-1], max(self.n - 1, 1))
+
+    def reduce(self, a: list) -> list:
+        # a has a degree < 2n - 1
+        if len(a) <= self.n:
+            return a
+        k   = len(a) - self.n                                  # length of the quotient
+        top = a[::-1][:k]                                      # rev(a) mod x^k
+        q   = _truncate(poly_mul(top, self.inv[:k]), k)
+        q   = (q + [0] * (k - len(q)))[::-1]
+        return poly_sub(a[:self.n], _truncate(poly_mul(q, self.f), self.n))
+
+    def mulmod(self, a: list, b: list) -> list:
+        return self.reduce(poly_mul(a, b))
+
+    def powmod(self, base: list, e: int) -> list:
+        base = self.reduce(base)
+        res  = [1] if self.n else []
+        for bit in bin(e)[2:]:
+            res = self.mulmod(res, res)
+            if bit == "1":
+                # multiplying by x is a shift (the only case of the distinct-degree step)
+                res = self.reduce([0] + res) if base == [0, 1] else self.mulmod(res, base)
+        return res
+
+# ============================ Root finding ============================
+
+def poly_roots(f: list) -> list:
+    """ All distinct roots of f in GF(p) (Cantor–Zassenhaus)
+        1. distinct-degree: the roots are those of gcd(f, x^p - x)
+        2. equal-degree: split with gcd(g, (x + a)^((p-1)/2) - 1) for random a
+    """
+    f = poly_trim(f[:])
+    if len(f) <= 1:
+        return []
+    f = poly_monic(f)
+
+    xp = Reducer(f).powmod([0, 1], P)
+    return _split_linear(poly_gcd(f, poly_sub(xp, [0, 1])))
+
+def _split_linear(g: list) -> list:
+    # g is monic and a product of distinct linear factors
+    if len(g) <= 1:
+        return []
+    if len(g) == 2:
+        return [-g[0] % P]
+
+    reducer = Reducer(g)
+    while True:
+        a = int.from_bytes(os.urandom(17), "big") % P
+        d = poly_gcd(g, poly_sub(reducer.powmod([a, 1], (P - 1) // 2), [1]))
+        if 1 < len(d) < len(g):
+            return _split_linear(d) + _split_linear(poly_divmod(g, d)[0])
@@ -1,5 +1,79 @@
+from functools import lru_cache
 from typing import List
 import struct
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from Common import file_chunks
+
+P1305   = 2**130 - 5
+R_CLAMP = 0x0ffffffc0ffffffc0ffffffc0fffffff
+M128    = 2**128 - 1
+
+@lru_cache(maxsize=64)
+def poly1305_powers(r: int, ways: int) -> tuple:
+    """ (r^ways, r^(ways-1), ..., r) mod p """
+    return tuple(pow(r, ways - j, P1305) for j in range(ways))
+
+def poly1305_blocks(acc: int, r: int, powers: tuple, data) -> int:
+    """ Absorb `data` (a multiple of 16 bytes except maybe for the very last block) into the accumulator,
+        k blocks per step with the precomputed powers of r and a single reduction:
+            acc = (acc + m_1) * r^k + m_2 * r^(k-1) + ... + m_k * r    mod p
+    :param powers: poly1305_powers(r, k)
+    """
+    step = 16 * len(powers)
+    full = len(data) - len(data) % step
+    if full:
+        r0, pad = powers[0], sum(powers) << 128 # the 0x01 byte appended to every block
+        terms   = [(128 * j, rj) for j, rj in enumerate(powers[1:], 1)]
+        for i in range(0, full, step):
+            n   = int.from_bytes(data[i:i+step], 'little')
+            acc = (acc + (n & M128)) * r0 + pad
+            for shift, rj in terms:
+                acc += ((n >> shift) & M128) * rj
+            acc %= P1305
+
+    for i in range(full, len(data), 16):
+        block = data[i:i+16]
+        acc = (acc + int.from_bytes(block, 'little') + (1 << (8 * len(block)))) * r % P1305
+    return acc
+
+class Poly1305:
+    """ Incremental Poly1305: Poly1305(key).update(m1).update(m2)...finalize() == poly1305(m1 + m2 + ..., key)
+        Chunks can be any buffer (bytes, memoryview, mmap), only the (< 16 bytes) tail of a chunk is kept
+        between two updates, `ways` blocks are absorbed per step (see `poly1305_blocks`).
+    """
+    def __init__(self, key: bytes, ways: int=16):
+        assert len(key) == 32
+        self.r    = int.from_bytes(key[:16], 'little') & R_CLAMP
+        self.s    = int.from_bytes(key[16:], 'little')
+        self.ways = ways
+        self.acc  = 0
+        self.tail = b""
+
+    def _blocks(self, data):
+        self.acc = poly1305_blocks(self.acc, self.r, poly1305_powers(self.r, self.ways), data)
+
+    def update(self, msg):
+        msg = memoryview(msg).cast("B")
+        if self.tail:
+            need = 16 - len(self.tail)
+            self.tail += bytes(msg[:need])
+            msg = msg[need:]
+            if len(self.tail) < 16:
+                return self
+            self._blocks(self.tail)
+            self.tail = b""
+        full = len(msg) - len(msg) % 16
+        self._blocks(msg[:full])
+        self.tail = bytes(msg[full:])
+        return self
+
+    def finalize(self) -> bytes:
+        self._blocks(self.tail)
+        self.tail = b""
+        return ((self.acc + self.s) % 2**128).to_bytes(16, 'little')
 
 def poly1305(msg: bytes, key: bytes) -> bytes:
     """ A pure python implementation of the Poly1305 MAC function
@@ -8,21 +82,30 @@ def poly1305(msg: bytes, key: bytes) -> bytes:
     :param key: The 32 byte key to use
     :return:    The 16 byte MAC value
     """
+    return poly1305_many([msg], key)[0]
 
+def poly1305_many(msgs: List[bytes], key: bytes, ways: int=16) -> List[bytes]:
+    """ [poly1305(msg, key) for msg in msgs], the powers of r are computed once for the whole batch """
     assert len(key) == 32
-    p = 2**130 - 5
-    r = int.from_bytes(key[:16], 'little')
+    r = int.from_bytes(key[:16], 'little') & R_CLAMP
     s = int.from_bytes(key[16:], 'little')
-    r = r & 0x0ffffffc0ffffffc0ffffffc0fffffff
+    powers = poly1305_powers(r, ways)
+    return [((poly1305_blocks(0, r, powers, msg) + s) % 2**128).to_bytes(16, 'little') for msg in msgs]
 
-    res = 0
-    for i in range(0, len(msg), 16):
-        block = msg[i:i+16] + b'\x01'
-        block = int.from_bytes(block, 'little')
-        res = (res + block) * r % p
-    res = (res + s)
-    res = int(res % 2**128)
-    return res.to_bytes(16, 'little')
+def chacha_poly1305_tag(key: bytes, chunks, associated_data: bytes=b"") -> bytes:
+    """ Same as poly1305(construct_chacha_poly1305_auth_msg(b"".join(chunks), associated_data), key)
+        without ever holding the whole ciphertext in memory
+    :param chunks: Iterable of bytes-like chunks of the ciphertext
+    """
+    mac = Poly1305(key)
+    mac.update(associated_data).update(bytes(-len(associated_data) % 16))
+    length = 0
+    for chunk in chunks:
+        mac.update(chunk)
+        length += len(chunk)
+    mac.update(bytes(-length % 16))
+    mac.update(struct.pack('<Q', len(associated_data)) + struct.pack('<Q', length))
+    return mac.finalize()
 
 def construct_chacha_poly1305_auth_msg(ciphertext: bytes, associated_data: bytes=b"") -> bytes:
     """ Merge the associated data and the ciphertext
@@ -0,0 +1,95 @@
+from typing import List, Tuple
+from collections import OrderedDict
+import mmap
+import os
+
+# Code shared by the AES_GCM and ChaChaPoly1305 attacks, their `Utils` put this directory on sys.path.
+
+def file_chunks(path: str, chunk_size: int=1 << 20):
+    """ Yield zero-copy memoryviews of `chunk_size` bytes of a memory-mapped file (don't keep them!) """
+    with open(path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as mv:
+            for i in range(0, len(mv), chunk_size):
+                chunk = mv[i:i+chunk_size]
+                try:
+                    yield chunk
+                finally:
+                    chunk.release()
+
+# ===== Nonce reuse sessions =====
+
+DATA_FORMAT = Tuple[bytes,bytes,bytes,bytes]
+xor = lambda msg1, msg2: bytes([m1^m2 for m1,m2 in zip(msg1, msg2)])
+
+def recover_keystream(known_data: List[DATA_FORMAT]) -> bytes:
+    """ The longest keystream given by the known plaintexts """
+    keystream = b""
+    for pt, ct, ad, tag in known_data:
+        if pt is not None:
+            key = xor(pt, ct)
+            if len(key) > len(keystream):
+                keystream = key
+    return keystream
+
+class KeystreamSession:
+    """ The keystream part of a nonce reuse session, the subclasses recover the authentication key
+        (`from_known_data`), forge the tags (`forgery_tag`) and are saved as JSON (`save` / `load`).
+    """
+    def __init__(self, keystream: bytes=b""):
+        self.keystream = keystream
+
+    def add_known_data(self, known_data: List[DATA_FORMAT]) -> bool:
+        """ Keep the longest keystream (the key doesn't change for the same nonce), True if it got longer """
+        keystream = recover_keystream(known_data)
+        if len(keystream) > len(self.keystream):
+            self.keystream = keystream
+            return True
+        return False
+
+    def forgery_message(self, target_plaintext: bytes, target_associated_data: bytes=b""):
+        """ Ciphertext of target_plaintext and its tag(s), see `forgery_tag` """
+        assert len(self.keystream) > 0, "Can't forgery if don't have keystream"
+        assert len(self.keystream) >= len(target_plaintext), "Target plaintext too long"
+
+        target_ciphertext = xor(target_plaintext, self.keystream)
+        return target_ciphertext, self.forgery_tag(target_ciphertext, target_associated_data)
+
+class SessionCache(OrderedDict):
+    """ The sessions of the last `size` nonces are kept in memory, and also on disk with `cache_dir`
+        (one JSON file `<prefix>-<nonce>.json` per nonce)
+    """
+    def __init__(self, session_cls, prefix: str, size: int=64):
+        super().__init__()
+        self.session_cls = session_cls
+        self.prefix      = prefix
+        self.size        = size
+
+    def get_session(self, nonce: bytes, known_data: List[DATA_FORMAT], cache_dir: str=None):
+        """ The session of `nonce`, only recovered from known_data if it isn't in the cache yet """
+        nonce = bytes(nonce)
+        path  = os.path.join(cache_dir, f"{self.prefix}-{nonce.hex()}.json") if cache_dir is not None else None
+
+        session = self.pop(nonce, None)
+        if session is None and path is not None and os.path.exists(path):
+            session = self.session_cls.load(path)
+        if session is None:
+            session, changed = self.session_cls.from_known_data(known_data), True
+        else:
+            changed = session.add_known_data(known_data)
+
+        if changed and path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            session.save(path)
+
+        self[nonce] = session
+        while len(self) > self.size:
+            self.popitem(last=False)
+        return session
+
+    def session(self, known_data: List[DATA_FORMAT], nonce: bytes=None, cache_dir: str=None):
+        """ A new session without nonce, else the cached one """
+        if nonce is None:
+            return self.session_cls.from_known_data(known_data)
+        return self.get_session(nonce, known_data, cache_dir)
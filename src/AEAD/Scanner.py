@@ -0,0 +1,164 @@
+from typing import Iterator, List, Tuple
+import importlib.util
+import sqlite3
+import struct
+import json
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from RecordIndex import file_format, scan_records, create_index, open_index, map_groups
+
+# Scan a capture of AEAD records for reused nonces, then recover the keys of every reused nonce.
+#   1. one pass over the capture: (aead, nonce, size, offset) of every record goes into an on-disk SQLite index
+#   2. every (aead, nonce) group with 2 records or more is read back by offset and sent to a process pool
+#   3. the recovered keys are appended to a JSONL file as soon as they are found
+# (the two passes are the ones of RecordIndex)
+# Capture formats:
+#   - JSONL: {"nonce": hex, "ad": hex, "ct": hex, "tag": hex, "pt": hex (optional), "aead": "gcm"|"chacha" (optional)}
+#   - binary: records of RECORD_HEADER = 5 little endian u32 (lengths of nonce, ad, ct, tag, pt; NO_PT if the
+#             plaintext is unknown) followed by the 5 fields, with the `aead` of the whole capture
+
+AEAD_DIRS     = {"gcm": "AES_GCM", "chacha": "ChaChaPoly1305"}
+RECORD_HEADER = struct.Struct("<5I")
+NO_PT         = 0xffffffff
+
+RECORD = Tuple[str,bytes,bytes,bytes,bytes,bytes] # aead, nonce, ad, ct, tag, pt (or None)
+
+# ===== Attack modules =====
+# Both AEAD directories have an `Attack` and a `Utils` module (flat imports), they are loaded under private names.
+
+_attacks = {}
+
+def load_attack(aead: str):
+    """ The `Attack` module of `aead` ("gcm" or "chacha") """
+    if aead not in _attacks:
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), AEAD_DIRS[aead])
+        names     = [f[:-3] for f in os.listdir(directory) if f.endswith(".py")]
+        saved     = {name: sys.modules.pop(name) for name in names if name in sys.modules}
+        sys.path.insert(0, directory)
+        try:
+            spec   = importlib.util.spec_from_file_location(f"_{aead}_Attack", os.path.join(directory, "Attack.py"))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        finally:
+            sys.path.remove(directory)
+            for name in names:
+                sys.modules.pop(name, None)
+            sys.modules.update(saved)
+        sys.modules[spec.name] = module
+        _attacks[aead] = module
+    return _attacks[aead]
+
+# ===== Capture =====
+
+def _parse_json(line: bytes, aead: str) -> RECORD:
+    rec = json.loads(line)
+    pt  = rec.get("pt")
+    return (rec.get("aead", aead), bytes.fromhex(rec["nonce"]), bytes.fromhex(rec.get("ad", "")),
+            bytes.fromhex(rec["ct"]), bytes.fromhex(rec["tag"]), bytes.fromhex(pt) if pt is not None else None)
+
+def _scan_capture(path: str, aead: str) -> Iterator[Tuple[str,bytes,int,int]]:
+    # (aead, nonce, size, offset) of every record, the ciphertexts of the binary format are skipped
+    def from_json(line):
+        rec = _parse_json(line, aead)
+        return rec[0], rec[1], len(rec[2]) + len(rec[3])
+
+    def from_binary(fp, header):
+        ln, la, lc, lt, lp = header
+        nonce = fp.read(ln)
+        fp.seek(la + lc + lt + (0 if lp == NO_PT else lp), os.SEEK_CUR)
+        return aead, nonce, la + lc
+
+    return scan_records(path, RECORD_HEADER, from_json, from_binary)
+
+def read_record(fp, offset: int, aead: str, fmt: str) -> RECORD:
+    """ The record at `offset` of an opened capture """
+    fp.seek(offset)
+    if fmt == "jsonl":
+        return _parse_json(fp.readline(), aead)
+    ln, la, lc, lt, lp = RECORD_HEADER.unpack(fp.read(RECORD_HEADER.size))
+    nonce, ad, ct, tag = fp.read(ln), fp.read(la), fp.read(lc), fp.read(lt)
+    return aead, nonce, ad, ct, tag, (fp.read(lp) if lp != NO_PT else None)
+
+def write_binary_record(fp, nonce: bytes, ad: bytes, ct: bytes, tag: bytes, pt: bytes=None):
+    fp.write(RECORD_HEADER.pack(len(nonce), len(ad), len(ct), len(tag), len(pt) if pt is not None else NO_PT))
+    fp.write(nonce + ad + ct + tag + (pt if pt is not None else b""))
+
+# ===== Index =====
+
+def build_index(capture: str, index_path: str, aead: str="gcm", batch_size: int=100000,
+                overwrite: bool=False) -> sqlite3.Connection:
+    """ Single pass over the capture, only the (aead, nonce, size, offset) of the records are stored (on disk)
+    :param overwrite: Replace `index_path` if it already exists (FileExistsError otherwise)
+    """
+    return create_index(_scan_capture(capture, aead), index_path,
+                        "aead TEXT, nonce BLOB, size INTEGER, offset INTEGER", "aead, nonce, size", overwrite, batch_size)
+
+def reused_nonces(db: sqlite3.Connection) -> Iterator[Tuple[str,bytes,int]]:
+    """ (aead, nonce, number of records) of every reused nonce """
+    yield from db.execute("SELECT aead, nonce, COUNT(*) FROM records GROUP BY aead, nonce HAVING COUNT(*) > 1")
+
+def nonce_group(db: sqlite3.Connection, fp, aead: str, nonce: bytes, fmt: str, max_records: int=8) -> List[RECORD]:
+    """ The `max_records` shortest records of a nonce (they give the smallest polynomials) """
+    offsets = db.execute("SELECT offset FROM records WHERE aead = ? AND nonce = ? ORDER BY size LIMIT ?",
+                         (aead, nonce, max_records)).fetchall()
+    return [read_record(fp, offset, aead, fmt) for offset, in offsets]
+
+# ===== Recovery =====
+
+def recover_group(records: List[RECORD]) -> dict:
+    """ Keys of one reused nonce, as a JSON-able dict """
+    aead, nonce = records[0][:2]
+    res = {"aead": aead, "nonce": nonce.hex(), "records": len(records)}
+    known_data = [(pt, ct, ad, tag) for _, _, ad, ct, tag, pt in records]
+    try:
+        session = load_attack(aead).NonceReuseSession.from_known_data(known_data)
+    except Exception as e:
+        res["error"] = f"{type(e).__name__}: {e}"
+        return res
+
+    if aead == "gcm":
+        res["keys"] = [[f"{h:032x}", f"{E0:032x}"] for h, E0 in session.keys]
+    else:
+        res["keys"] = [[f"{session.r:032x}", f"{session.s:032x}"]]
+    res["keystream"] = session.keystream.hex()
+    return res
+
+def scan(capture: str, output: str, aead: str="gcm", index_path: str=None, processes: int=None,
+         max_records: int=8, window: int=1024, overwrite: bool=False) -> int:
+    """ Find every reused nonce of a capture and recover its keys (see the top of this file)
+
+    :param capture: Path of the JSONL (.jsonl) or binary capture
+    :param output: JSONL file where one result per reused nonce is appended
+    :param aead: AEAD of the records ("gcm" or "chacha") when the record doesn't say it
+    :param index_path: Where to keep the index (default: a temporary file, deleted at the end)
+    :param processes: Number of workers (default: cpu count)
+    :param max_records: Number of records per nonce given to the recovery (the shortest ones)
+    :param window: Number of groups read and sent to the pool at once (bounds the memory)
+    :param overwrite: Replace `index_path` if it already exists
+    :return: Number of reused nonces
+    """
+    fmt   = file_format(capture)
+    build = lambda path: build_index(capture, path, aead, overwrite=overwrite)
+
+    count = 0
+    with open_index(build, index_path) as db, open(capture, "rb") as fp, open(output, "a") as out:
+        groups = (nonce_group(db, fp, a, nonce, fmt, max_records) for a, nonce, _ in reused_nonces(db))
+        for res in map_groups(recover_group, groups, processes, window):
+            out.write(json.dumps(res) + "\n")
+            out.flush()
+            count += 1
+    return count
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Recover the keys of every reused nonce of an AEAD capture")
+    parser.add_argument("capture")
+    parser.add_argument("output")
+    parser.add_argument("--aead", choices=sorted(AEAD_DIRS), default="gcm")
+    parser.add_argument("--index")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--overwrite", action="store_true", help="replace the index if it already exists")
+    args = parser.parse_args()
+    print(scan(args.capture, args.output, args.aead, args.index, args.processes, overwrite=args.overwrite), "reused nonces")
@@ -1,4 +1,88 @@
-from Utils import Inv_Sbox, Div1, Div2, Div3, reverse_rounds_key
+from Utils import Sbox, Inv_Sbox, Mul1, Mul2, Mul3, Div1, Div2, Div3, Rcon, gf_mul, reverse_rounds_key, reverse_keys, verify_keys
+from functools import lru_cache
+import itertools
+import mmap
+
+# =========================== Differential Tables ===========================
+# Every rk10 candidate set is stored as a 256-bit mask (bit k set <=> k is still possible),
+# so intersections/unions of candidates are just `&`/`|` on Python ints.
+
+FULL_MASK = (1 << 256) - 1
+
+# MixColumns coefficients seen by the bytes [ii, jj, kk, ll] when the fault hits row 0, 1, 2, 3
+DFA_COEFFS = (
+    (2, 1, 1, 3),
+    (3, 2, 1, 1),
+    (1, 3, 2, 1),
+    (1, 1, 3, 2),
+)
+DIV_TABLES = {1: Div1, 2: Div2, 3: Div3}
+
+# positions whose j-th bit is 0, used to permute a mask by `k -> k ^ (1 << j)`
+_LOW_HALVES = [sum(1 << k for k in range(256) if not (k >> j) & 1) for j in range(8)]
+
+def _mask_to_set(mask: int) -> set:
+    res = set()
+    while mask:
+        low = mask & -mask
+        res.add(low.bit_length() - 1)
+        mask ^= low
+    return res
+
+def _set_to_mask(cands) -> int:
+    mask = 0
+    for k in cands:
+        mask |= 1 << k
+    return mask
+
+def _xor_translate(mask: int, x: int) -> int:
+    """ Return the mask of {u ^ x : u in mask} """
+    for j in range(8):
+        if (x >> j) & 1:
+            s, low = 1 << j, _LOW_HALVES[j]
+            mask = ((mask & low) << s) | ((mask >> s) & low)
+    return mask
+
+@lru_cache(maxsize=None)
+def differential_table(d: int, factor: int):
+    """ Precomputed (lazily) row of the DFA tables for the ciphertext difference d = c ^ f.
+        Since Inv_Sbox[c ^ k] ^ Inv_Sbox[f ^ k] only depends on d and u = c ^ k:
+            DIFF(u) = Div{factor}[Inv_Sbox[u] ^ Inv_Sbox[u ^ d]]
+    :param d: The difference of the true and faulty ciphertext byte
+    :param factor: The MixColumns coefficient (1, 2 or 3)
+    :return: (mask of all reachable DIFF values, list `pre` where pre[DIFF] is the mask of u)
+    """
+    div = DIV_TABLES[factor]
+    pre = [0] * 256
+    for u in range(256):
+        pre[div[Inv_Sbox[u] ^ Inv_Sbox[u ^ d]]] |= 1 << u
+    image = _set_to_mask(diff for diff in range(256) if pre[diff])
+    return image, pre
+
+def filter_rk10_masks(c, f, dfa_indexs, round_key10):
+    """ Same as `bruteforce_rk10_when_fault_at` but `round_key10` is a list of 256-bit candidate masks """
+    ds = [c[i] ^ f[i] for i in dfa_indexs]
+
+    # Find all DIFF candidates, assuming that byte `row` of the column is flawed
+    diff_cands = []
+    for coeffs in DFA_COEFFS:
+        cand = FULL_MASK
+        for d, factor in zip(ds, coeffs):
+            cand &= differential_table(d, factor)[0]
+        diff_cands.append(cand)
+
+    # Find all rk10 candidates
+    for pos, (i, d) in enumerate(zip(dfa_indexs, ds)):
+        u_mask = 0
+        for coeffs, cand in zip(DFA_COEFFS, diff_cands):
+            pre = differential_table(d, coeffs[pos])[1]
+            while cand:
+                low = cand & -cand
+                u_mask |= pre[low.bit_length() - 1]
+                cand ^= low
+        round_key10[i] &= _xor_translate(u_mask, c[i])
+
+# ============================== DFA (Round 9) ==============================
 
 def bruteforce_rk10_when_fault_at(c, f, dfa_indexs, round_key10):
     """ Example that flawed byte at column 0 and row 0:
@@ -18,61 +102,83 @@ def bruteforce_rk10_when_fault_at(c, f, dfa_indexs, round_key10):
         Similar to other rows 1,2,3. Then we can find all candidates of rk(10, 0), rk(10, 1), rk(10, 2), rk(10, 3)
     """
     
-    ii, jj, kk, ll = dfa_indexs
-    # =================================== Find all DIFF candidates ===================================
-    # Assuming that byte 0 is flawed
-    diff_cand0 = set(Div2[Inv_Sbox[c[ii] ^ rk10_ii] ^ Inv_Sbox[f[ii] ^ rk10_ii]] for rk10_ii in range(256)) & \
-                 set(Div1[Inv_Sbox[c[jj] ^ rk10_jj] ^ Inv_Sbox[f[jj] ^ rk10_jj]] for rk10_jj in range(256)) & \
-                 set(Div1[Inv_Sbox[c[kk] ^ rk10_kk] ^ Inv_Sbox[f[kk] ^ rk10_kk]] for rk10_kk in range(256)) & \
-                 set(Div3[Inv_Sbox[c[ll] ^ rk10_ll] ^ Inv_Sbox[f[ll] ^ rk10_ll]] for rk10_ll in range(256))
-
-    # Assuming that byte 1 is flawed
-    diff_cand1 = set(Div3[Inv_Sbox[c[ii] ^ rk10_ii] ^ Inv_Sbox[f[ii] ^ rk10_ii]] for rk10_ii in range(256)) & \
-                 set(Div2[Inv_Sbox[c[jj] ^ rk10_jj] ^ Inv_Sbox[f[jj] ^ rk10_jj]] for rk10_jj in range(256)) & \
-                 set(Div1[Inv_Sbox[c[kk] ^ rk10_kk] ^ Inv_Sbox[f[kk] ^ rk10_kk]] for rk10_kk in range(256)) & \
-                 set(Div1[Inv_Sbox[c[ll] ^ rk10_ll] ^ Inv_Sbox[f[ll] ^ rk10_ll]] for rk10_ll in range(256))
-
-    # Assuming that byte 2 is flawed
-    diff_cand2 = set(Div1[Inv_Sbox[c[ii] ^ rk10_ii] ^ Inv_Sbox[f[ii] ^ rk10_ii]] for rk10_ii in range(256)) & \
-                 set(Div3[Inv_Sbox[c[jj] ^ rk10_jj] ^ Inv_Sbox[f[jj] ^ rk10_jj]] for rk10_jj in range(256)) & \
-                 set(Div2[Inv_Sbox[c[kk] ^ rk10_kk] ^ Inv_Sbox[f[kk] ^ rk10_kk]] for rk10_kk in range(256)) & \
-                 set(Div1[Inv_Sbox[c[ll] ^ rk10_ll] ^ Inv_Sbox[f[ll] ^ rk10_ll]] for rk10_ll in range(256))
-
-    # Assuming that byte 3 is flawed
-    diff_cand3 = set(Div1[Inv_Sbox[c[ii] ^ rk10_ii] ^ Inv_Sbox[f[ii] ^ rk10_ii]] for rk10_ii in range(256)) & \
-                 set(Div1[Inv_Sbox[c[jj] ^ rk10_jj] ^ Inv_Sbox[f[jj] ^ rk10_jj]] for rk10_jj in range(256)) & \
-                 set(Div3[Inv_Sbox[c[kk] ^ rk10_kk] ^ Inv_Sbox[f[kk] ^ rk10_kk]] for rk10_kk in range(256)) & \
-                 set(Div2[Inv_Sbox[c[ll] ^ rk10_ll] ^ Inv_Sbox[f[ll] ^ rk10_ll]] for rk10_ll in range(256))
-
-    # =================================== Find all rk10 candidates ===================================
-    round_key10[ii] &= (
-        set([rk10_ii for rk10_ii in range(256) if Div2[Inv_Sbox[c[ii] ^ rk10_ii] ^ Inv_Sbox[f[ii] ^ rk10_ii]] in diff_cand0]) | \
-        set([rk10_ii for rk10_ii in range(256) if Div3[Inv_Sbox[c[ii] ^ rk10_ii] ^ Inv_Sbox[f[ii] ^ rk10_ii]] in diff_cand1]) | \
-        set([rk10_ii for rk10_ii in range(256) if Div1[Inv_Sbox[c[ii] ^ rk10_ii] ^ Inv_Sbox[f[ii] ^ rk10_ii]] in diff_cand2]) | \
-        set([rk10_ii for rk10_ii in range(256) if Div1[Inv_Sbox[c[ii] ^ rk10_ii] ^ Inv_Sbox[f[ii] ^ rk10_ii]] in diff_cand3])
-    )
-
-    round_key10[jj] &= (
-        set([rk10_jj for rk10_jj in range(256) if Div1[Inv_Sbox[c[jj] ^ rk10_jj] ^ Inv_Sbox[f[jj] ^ rk10_jj]] in diff_cand0]) | \
-        set([rk10_jj for rk10_jj in range(256) if Div2[Inv_Sbox[c[jj] ^ rk10_jj] ^ Inv_Sbox[f[jj] ^ rk10_jj]] in diff_cand1]) | \
-        set([rk10_jj for rk10_jj in range(256) if Div3[Inv_Sbox[c[jj] ^ rk10_jj] ^ Inv_Sbox[f[jj] ^ rk10_jj]] in diff_cand2]) | \
-        set([rk10_jj for rk10_jj in range(256) if Div1[Inv_Sbox[c[jj] ^ rk10_jj] ^ Inv_Sbox[f[jj] ^ rk10_jj]] in diff_cand3])
-    )
-
-    round_key10[kk] &= (
-        set([rk10_kk for rk10_kk in range(256) if Div1[Inv_Sbox[c[kk] ^ rk10_kk] ^ Inv_Sbox[f[kk] ^ rk10_kk]] in diff_cand0]) | \
-        set([rk10_kk for rk10_kk in range(256) if Div1[Inv_Sbox[c[kk] ^ rk10_kk] ^ Inv_Sbox[f[kk] ^ rk10_kk]] in diff_cand1]) | \
-        set([rk10_kk for rk10_kk in range(256) if Div2[Inv_Sbox[c[kk] ^ rk10_kk] ^ Inv_Sbox[f[kk] ^ rk10_kk]] in diff_cand2]) | \
-        set([rk10_kk for rk10_kk in range(256) if Div3[Inv_Sbox[c[kk] ^ rk10_kk] ^ Inv_Sbox[f[kk] ^ rk10_kk]] in diff_cand3])
-    )
-
-    round_key10[ll] &= (
-        set([rk10_ll for rk10_ll in range(256) if Div3[Inv_Sbox[c[ll] ^ rk10_ll] ^ Inv_Sbox[f[ll] ^ rk10_ll]] in diff_cand0]) | \
-        set([rk10_ll for rk10_ll in range(256) if Div1[Inv_Sbox[c[ll] ^ rk10_ll] ^ Inv_Sbox[f[ll] ^ rk10_ll]] in diff_cand1]) | \
-        set([rk10_ll for rk10_ll in range(256) if Div1[Inv_Sbox[c[ll] ^ rk10_ll] ^ Inv_Sbox[f[ll] ^ rk10_ll]] in diff_cand2]) | \
-        set([rk10_ll for rk10_ll in range(256) if Div2[Inv_Sbox[c[ll] ^ rk10_ll] ^ Inv_Sbox[f[ll] ^ rk10_ll]] in diff_cand3])
-    )
+    masks = [_set_to_mask(rk10_i) for rk10_i in round_key10]
+    filter_rk10_masks(c, f, dfa_indexs, masks)
+    for i in dfa_indexs:
+        round_key10[i] &= _mask_to_set(masks[i])
+
+
+# ============================== Fault Ingestion ==============================
+
+# The 4 bytes of the ciphertext affected by a round-9 fault in each column, in [ii, jj, kk, ll] order
+DFA_PATTERNS = (
+    (0, 13, 10, 7),
+    (4, 1, 14, 11),
+    (8, 5, 2, 15),
+    (12, 9, 6, 3),
+)
+_PATTERN_OF = {frozenset(pattern): pattern for pattern in DFA_PATTERNS}
 
+def classify_fault(c, f):
+    """ Return the ordered `dfa_indexs` matching the differing bytes of c and f,
+        or None if the fault is unusable (no difference, or not a round-9 single column fault)
+    """
+    return _PATTERN_OF.get(frozenset(i for i in range(16) if c[i] != f[i]))
+
+def load_fault_trace(path: str, record_size: int=32):
+    """ Memory-map a binary trace file and yield its (c, f) pairs.
+        Each record is `c (16 bytes) || f (16 bytes)`, extra trailing bytes of a record are ignored.
+    """
+    assert record_size >= 32
+    with open(path, "rb") as fp:
+        if fp.seek(0, 2) < record_size:
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for off in range(0, len(mm) - record_size + 1, record_size):
+                yield mm[off:off + 16], mm[off + 16:off + 32]
+
+def attack_dfa_round9_stream(faults):
+    """ Differential Fault Analysis on AES (Round 9) from a stream of faulty ciphertexts
+
+        Args:
+            faults: path of a binary trace file (see `load_fault_trace`) or an iterable of
+                    (c, f) or (c, f, indexs). Pairs without `indexs` are classified by their
+                    differing bytes, unusable ones (wrong pattern, inconsistent with the
+                    current candidates) are dropped.
+
+        Returns:
+            master_key (bytes): The master key of the AES cipher, stop reading as soon as
+                                all 16 bytes of rk10 are unique.
+
+        Raises:
+            ValueError: the faults ran out before all 16 bytes of rk10 were found
+    """
+
+    if isinstance(faults, str):
+        faults = load_fault_trace(faults)
+
+    rk10  = [FULL_MASK] * 16
+    todo  = set(DFA_PATTERNS)   # columns that have not converged yet
+    for fault in faults:
+        c, f = fault[0], fault[1]
+        dfa_indexs = tuple(fault[2]) if len(fault) > 2 else classify_fault(c, f)
+        if dfa_indexs not in todo:
+            continue
+
+        # filter a copy, a fault that empties a candidate set is not a round-9 fault
+        masks = rk10[:]
+        filter_rk10_masks(c, f, dfa_indexs, masks)
+        if not all(masks[i] for i in dfa_indexs):
+            continue
+        rk10 = masks
+
+        if not any(rk10[i] & (rk10[i] - 1) for i in dfa_indexs):
+            todo.discard(dfa_indexs)
+            if not todo:
+                # recover the master key from expanded round key (rk10)
+                return reverse_rounds_key(round_key=bytes([rk10_i.bit_length() - 1 for rk10_i in rk10]), n_rounds=10)
+
+    raise ValueError("Not enough faults to recover the round key")
 
 def attack_dfa_round9(dfa_oracle):
     """ Differential Fault Analysis on AES (Round 9)
@@ -81,27 +187,263 @@ def attack_dfa_round9(dfa_oracle):
         - https://eprint.iacr.org/2003/010.pdf
 
         Args:
-            dfa_oracle (function): Oracle function that returns [c, f, indexs], where:
+            dfa_oracle (function): Oracle function that returns [c, f] or [c, f, indexs], where:
             - c (bytes): the true ciphertext
             - f (bytes): the faulty ciphertext
-            - indexs (list): list of indexes where the fault occurs
+            - indexs (list, optional): list of indexes where the fault occurs
             [!] Important: indexs must be one of the following:
                     [0,13,10,7], 
                     [4,1,14,11], 
                     [8,5,2,15 ], 
                     [12,9,6,3 ]
-            Ex: after comparing the real and faulty ciphertexts: indexs = [i for i in range(16) if c[i] != f[i]]
-                You MUST rearrange the indexes to match the above format!
+            If indexs is omitted, it is found by `classify_fault` (and unusable faults are dropped).
 
         Returns:
             master_key (bytes): The master key of the AES cipher
     """
 
-    rk10 = [set(range(256)) for _ in range(16)]
-    while any(len(rk10_i) > 1 for rk10_i in rk10):
-        c, f, dfa_indexs = dfa_oracle()
-        bruteforce_rk10_when_fault_at(c, f, dfa_indexs, rk10)
-        # print(f"rk10 cands: {[len(rk10_i) for rk10_i in rk10]}")
-    
-    # recover the master key from expanded round key (rk10)
-    return reverse_rounds_key(round_key=bytes([list(rk10_i)[0] for rk10_i in rk10]), n_rounds=10)
\ No newline at end of file
+    def faults():
+        while True:
+            yield dfa_oracle()
+
+    return attack_dfa_round9_stream(faults())
+
+# ============================== DFA (Round 8) ==============================
+
+def dfa_round8_column_candidates(c, f, dfa_indexs):
+    """ All possible rk10 bytes [ii, jj, kk, ll] of one column when the fault is injected at round 8.
+        A single byte fault at the input of round 8 is spread by MixColumns over one column of round 9,
+        then by ShiftRows over all 4 columns: every column of the ciphertext behaves like a round-9 DFA
+        with exactly one flawed row.
+
+    :return: List of 4 sets (one per flawed row) of tuples (rk10[ii], rk10[jj], rk10[kk], rk10[ll])
+    """
+    ds = [c[i] ^ f[i] for i in dfa_indexs]
+
+    res = []
+    for coeffs in DFA_COEFFS:
+        diff_cand = FULL_MASK
+        for d, factor in zip(ds, coeffs):
+            diff_cand &= differential_table(d, factor)[0]
+
+        cands = set()
+        for diff in _mask_to_set(diff_cand):
+            key_bytes = [
+                _mask_to_set(_xor_translate(differential_table(d, factor)[1][diff], c[i]))
+                for i, d, factor in zip(dfa_indexs, ds, coeffs)
+            ]
+            cands.update(itertools.product(*key_bytes))
+        res.append(cands)
+    return res
+
+def dfa_round8_candidates(faults):
+    """ Reduce the rk10 key space column by column from one or more round-8 faults
+        The fault hits column `j` of round 9, so the column `col` of the ciphertext is flawed at row (j - col) % 4.
+        Each fault has its own unknown `j`, so we enumerate them all (4^len(faults) blocks, mostly empty).
+
+    :param faults: List of (c, f) with `c` the true ciphertext and `f` the faulty one
+    :return: List of (j, block), `j` the round-9 column of the first fault and `block` 4 lists of column
+             candidates (see `dfa_round8_column_candidates`). The rk10 candidates are the union of the
+             cartesian products of the blocks: ~2^34 for one fault (see `dfa_round8_filter`), a handful for two.
+    """
+    if not faults:
+        raise ValueError("At least one fault is needed")
+
+    per_fault = [
+        [dfa_round8_column_candidates(c, f, dfa_indexs) for dfa_indexs in DFA_PATTERNS]
+        for c, f in faults
+    ]
+
+    blocks = []
+    for js in itertools.product(range(4), repeat=len(per_fault)):
+        block = []
+        for col in range(4):
+            cands = per_fault[0][col][(js[0] - col) % 4]
+            for cols, j in zip(per_fault[1:], js[1:]):
+                cands = cands & cols[col][(j - col) % 4]
+            block.append(sorted(cands))
+        if all(block):
+            blocks.append((js[0], block))
+    return blocks
+
+# The 4 column differences of a round-8 fault are linked by the MixColumns of round 8: at the input of
+# round 9, the faulty column `j` has the differences coeffs[r] * delta (coeffs = DFA_COEFFS[m], m unknown).
+# Row r of that column reaches the ciphertext column c = (j - r) % 4 through round 9, so for every c:
+#     coeffs[r] * delta = Inv_Sbox[u_c ^ K_c] ^ Inv_Sbox[u_c ^ D_c ^ K_c]
+# with u_c, D_c computed from the rk10 bytes of column c alone, and K_c = InvMixColumns(rk9 column c)[r].
+# rk9 column c = rk10 column c ^ rk10 column c - 1 for c = 1, 2, 3 so K_1, K_2, K_3 are XORs of one term per
+# ciphertext column: for every (m, delta) the 3 equations are matched in the middle, (col0, col1) against
+# (col2, col3) on 24 bits, and the non-linear K_0 (SubWord of the key schedule) is checked on the survivors.
+# One fault goes from ~2^34 to ~2^12 rk10 candidates (Tunstall et al.'s second step) in ~2^28 simple operations.
+
+INV_MIX = ((14, 11, 13, 9), (9, 14, 11, 13), (13, 9, 14, 11), (11, 13, 9, 14))
+MUL_TABLES = {1: Mul1, 2: Mul2, 3: Mul3}
+
+# rk10 byte -> (ciphertext column, index in DFA_PATTERNS[column])
+_PATTERN_POS = {pos: (col, k) for col, pattern in enumerate(DFA_PATTERNS) for k, pos in enumerate(pattern)}
+
+@lru_cache(maxsize=None)
+def _mul_table(factor: int):
+    import numpy as np
+
+    return np.array([gf_mul(x, factor) for x in range(256)], dtype=np.uint8)
+
+@lru_cache(maxsize=None)
+def _np_table(table: tuple):
+    import numpy as np
+
+    return np.array(table, dtype=np.uint8)
+
+def _inv_mix_row(cols, row: int):
+    # row `row` of InvMixColumns of the (N, 4) columns
+    import numpy as np
+
+    res = np.zeros(len(cols), dtype=np.uint8)
+    for i, factor in enumerate(INV_MIX[row]):
+        res ^= _mul_table(factor)[cols[:, i]]
+    return res
+
+def _match(left, right):
+    # all (i, k) such that left[i] == right[k], by sorting and searching
+    import numpy as np
+
+    order = np.argsort(right, kind="stable")
+    srt   = right[order]
+    lo, hi = np.searchsorted(srt, left, "left"), np.searchsorted(srt, left, "right")
+    count  = hi - lo
+    li = np.repeat(np.arange(len(left)), count)
+    ri = order[np.repeat(lo, count) + np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)]
+    return li, ri
+
+def _join(left, right):
+    """ Indices (i, k) such that left[i] == right[k] (keys < 2^31)
+        Both sides are sorted together as key << 32 | index: only the runs of keys shared by the two sides
+        go through `_match`.
+    """
+    import numpy as np
+
+    n = len(left)
+    tagged = np.concatenate([
+        left.astype(np.int64) << 32 | np.arange(n), right.astype(np.int64) << 32 | np.arange(n, n + len(right))
+    ])
+    tagged.sort()
+    keys, index = tagged >> 32, tagged & 0xffffffff
+
+    # keep the runs of equal keys holding both sides
+    start = np.ones(len(tagged), dtype=bool)
+    start[1:] = keys[1:] != keys[:-1]
+    run   = np.cumsum(start) - 1
+    side  = index < n
+    cross = np.zeros(run[-1] + 1 if len(run) else 0, dtype=bool)
+    cross[run[1:][~start[1:] & (side[1:] != side[:-1])]] = True
+    keep  = cross[run]
+
+    index, keys = index[keep], keys[keep]
+    is_left = index < n
+    li, ri  = _match(keys[is_left], keys[~is_left])
+    return index[is_left][li], index[~is_left][ri] - n
+
+def dfa_round8_filter(c, f, j: int, block, m: int):
+    """ rk10 candidates of a block (see `dfa_round8_candidates`) consistent with the differences
+        coeffs = DFA_COEFFS[m] of the fault (c, f) at the input of round 9 (see above)
+
+    :return: uint8 array of shape (N, 16)
+    """
+    import numpy as np
+
+    inv_sbox = _np_table(Inv_Sbox)
+    cols = [np.array(cands, dtype=np.uint8).reshape(-1, 4) for cands in block]
+    rows = [(j - col) % 4 for col in range(4)]
+    c, f = np.frombuffer(bytes(c), dtype=np.uint8), np.frombuffer(bytes(f), dtype=np.uint8)
+
+    # (t, w) of every column sorted by the input difference e = Inv_Sbox[w] ^ Inv_Sbox[w ^ D] they give
+    u, by_diff = [], []
+    for col, (pattern, row) in enumerate(zip(DFA_PATTERNS, rows)):
+        pattern = list(pattern)
+        a  = _inv_mix_row(inv_sbox[c[pattern] ^ cols[col]], row)
+        a_ = _inv_mix_row(inv_sbox[f[pattern] ^ cols[col]], row)
+        w  = np.arange(256, dtype=np.uint8)
+        e  = (inv_sbox[w][None, :] ^ inv_sbox[w[None, :] ^ (a ^ a_)[:, None]]).ravel()
+        order = np.argsort(e, kind="stable")
+        u.append(a)
+        by_diff.append((order, np.searchsorted(e[order], np.arange(257))))
+
+    # g[c][col]: contribution of the rk10 bytes of column `col` to K_c (c = 1, 2, 3)
+    g = [[np.zeros(len(t), dtype=np.uint8) for t in cols] for _ in range(4)]
+    for kc in (1, 2, 3):
+        for i, factor in enumerate(INV_MIX[rows[kc]]):
+            for pos in (4 * kc + i, 4 * (kc - 1) + i):
+                col, k = _PATTERN_POS[pos]
+                g[kc][col] ^= _mul_table(factor)[cols[col][:, k]]
+
+    res = []
+    for delta in range(1, 256):
+        sols = []
+        for col in range(4):
+            e = MUL_TABLES[DFA_COEFFS[m][rows[col]]][delta]
+            order, bounds = by_diff[col]
+            t, w = np.divmod(order[bounds[e]:bounds[e + 1]], 256)
+            sols.append((t, u[col][t] ^ w.astype(np.uint8)))
+        if not all(len(t) for t, _ in sols):
+            continue
+        (t0, k0), (t1, k1), (t2, k2), (t3, k3) = sols
+
+        key   = lambda b1, b2, b3: b1.astype(np.uint32) | b2.astype(np.uint32) << 8 | b3.astype(np.uint32) << 16
+        outer = lambda x, y: (x[:, None] ^ y[None, :]).ravel()
+        left  = key(outer(g[1][0][t0], g[1][1][t1] ^ k1), outer(g[2][0][t0], g[2][1][t1]), outer(g[3][0][t0], g[3][1][t1]))
+        right = key(outer(g[1][2][t2], g[1][3][t3]), outer(g[2][2][t2] ^ k2, g[2][3][t3]), outer(g[3][2][t2], g[3][3][t3] ^ k3))
+        li, ri = _join(left, right)
+        if not len(li):
+            continue
+
+        i0, i1 = np.divmod(li, len(t1))
+        i2, i3 = np.divmod(ri, len(t3))
+        rk10 = np.zeros((len(li), 16), dtype=np.uint8)
+        for col, t, i in zip(range(4), (t0, t1, t2, t3), (i0, i1, i2, i3)):
+            rk10[:, list(DFA_PATTERNS[col])] = cols[col][t[i]]
+
+        # K_0: rk9 column 0 = rk10 column 0 ^ SubWord(RotWord(rk9 column 3)) ^ Rcon[10]
+        rk9_3 = rk10[:, 12:16] ^ rk10[:, 8:12]
+        rk9_0 = rk10[:, 0:4] ^ _np_table(Sbox)[np.roll(rk9_3, -1, axis=1)]
+        rk9_0[:, 0] ^= Rcon[10]
+        res.append(rk10[_inv_mix_row(rk9_0, rows[0]) == k0[i0]])
+
+    return np.concatenate(res) if res else np.zeros((0, 16), dtype=np.uint8)
+
+def _round8_task(args):
+    """ Worker: filter one (block, m) then verify the rk10 candidates against a known plaintext/ciphertext pair """
+    c, f, j, block, m, plaintext, ciphertext = args
+    keys = reverse_keys(dfa_round8_filter(c, f, j, block, m), n_rounds=10)
+    keys = keys[verify_keys(keys, plaintext, ciphertext)]
+    return bytes(keys[0]) if len(keys) else None
+
+def attack_dfa_round8(faults, plaintext: bytes, ciphertext: bytes, processes: int=None):
+    """ Differential Fault Analysis on AES (Round 8)
+        References:
+        - https://eprint.iacr.org/2009/575.pdf (Tunstall, Mukhopadhyay, Ali)
+
+        Args:
+            faults (list): List of (c, f), c is the true ciphertext and f the ciphertext faulted (one byte)
+                           at the input of round 8. One fault is enough (~2^12 candidates are verified).
+            plaintext (bytes): a known plaintext
+            ciphertext (bytes): the ciphertext of `plaintext`, used to verify candidates
+            processes (int): number of workers filtering the key space (default: cpu count),
+                             every (block, MixColumns column) of the first fault is a task
+
+        Returns:
+            master_key (bytes): The master key of the AES cipher, or None if no candidate matches
+    """
+
+    blocks = dfa_round8_candidates(faults)
+    c, f   = faults[0][:2]
+    tasks  = [(c, f, j, block, m, plaintext, ciphertext) for j, block in blocks for m in range(4)]
+    if processes == 1:
+        results = map(_round8_task, tasks)
+        return next((key for key in results if key is not None), None)
+
+    from multiprocessing import Pool
+    with Pool(processes) as pool:
+        for key in pool.imap_unordered(_round8_task, tasks):
+            if key is not None:
+                return key
+    return None
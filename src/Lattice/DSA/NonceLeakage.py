@@ -1,4 +1,3 @@
-from sage.all import *
 from Lattice.Utils import hnp_recentering
 
 """
@@ -1,10 +1,10 @@
-from sage.all import *
 from math import log2, ceil
 
 def low_density_attack(pk, s):
     # Ref: https://eprint.iacr.org/2009/537.pdf
 
     # step 0: sanity check
+    from sage.all import QQ, identity_matrix, vector, sqrt
     n = len(pk)
     d = n / log2(max(pk))
     assert d < 0.9408, "Density condition not satisfied {d} not < 0.9408"
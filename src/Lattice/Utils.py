@@ -1,5 +1,3 @@
-from sage.all import *
-
 def hnp_recentering(Ts, Us, q, l, lattice_reduction=None, debug=False):
     """ Ref: "Phong Q. Nguyen and Mehdi Tibouchi. Lattice-based fault attacks on signatures. In Marc Joye and 
         Michael Tunstall, editors, Fault Analysis in Cryptography, pages 201-220. Springer, 2012."
@@ -13,6 +11,7 @@ def hnp_recentering(Ts, Us, q, l, lattice_reduction=None, debug=False):
     """
 
     # step 0: setup
+    from sage.all import QQ, identity_matrix, matrix, block_matrix, vector, cputime
     assert len(Ts) == len(Us)
     if lattice_reduction is None:
         lattice_reduction = lambda M: M.LLL()
@@ -54,6 +53,7 @@ def hnp_svp_approach(Ts, As, q, BOUND, lattice_reduction=None, debug=False):
     """
 
     # step 0: setup
+    from sage.all import QQ, identity_matrix, matrix, block_matrix, cputime
     assert len(Ts) == len(As)
     if lattice_reduction is None:
         lattice_reduction = lambda M: M.LLL()
@@ -1,4 +1,3 @@
-from sage.all import *
 from Utils import SymbolicXorShift128, Helper
 
 def CreateLeakTable(N, high_bits_precision=12):
@@ -33,6 +32,8 @@ def Crack(output, N, skip=0) -> list:
             ->  Crack(ouput=hints, N=mult, skip=pre_run) = [state0, state1]
     """
 
+    from sage.all import matrix, GF
+
     leaks_table = CreateLeakTable(N)
     sym_prng      = SymbolicXorShift128()
 
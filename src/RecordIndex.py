@@ -0,0 +1,91 @@
+from typing import Callable, Iterator
+from multiprocessing import Pool
+from contextlib import contextmanager, nullcontext
+import itertools
+import tempfile
+import sqlite3
+import struct
+import os
+
+# The two passes shared by the scanners of huge record files (AEAD/Scanner.py, Ed25519/SignatureForgery.py):
+#   1. the JSONL (.jsonl) or binary file is read once, a few columns and the offset of every record go into
+#      the table `records` of an on-disk SQLite index
+#   2. the groups of records found by a query are read back by offset and processed over a process pool
+
+def file_format(path: str) -> str:
+    return "jsonl" if path.endswith((".jsonl", ".json")) else "binary"
+
+def scan_records(path: str, header: struct.Struct, from_json: Callable, from_binary: Callable) -> Iterator[tuple]:
+    """ The index row of every record of `path`, the offset of the record is appended as the last column
+
+    :param header: Fixed size header of the binary records
+    :param from_json: Columns of a JSONL line
+    :param from_binary: Columns of a binary record from (fp, unpacked header), it reads or skips the rest of the record
+    """
+    with open(path, "rb") as fp:
+        if file_format(path) == "jsonl":
+            offset = 0
+            for line in fp:
+                if line.strip():
+                    yield from_json(line) + (offset,)
+                offset += len(line)
+        else:
+            while True:
+                offset = fp.tell()
+                data = fp.read(header.size)
+                if len(data) < header.size:
+                    break
+                yield from_binary(fp, header.unpack(data)) + (offset,)
+
+def create_index(rows: Iterator[tuple], index_path: str, columns: str, index: str,
+                 overwrite: bool=False, batch_size: int=100000) -> sqlite3.Connection:
+    """ A new SQLite index with the rows in the table `records`
+
+    :param columns: Column definitions of the table, the offset is the last one
+    :param index: Indexed columns
+    :param overwrite: Replace `index_path` if it already exists (FileExistsError otherwise)
+    """
+    if os.path.exists(index_path):
+        if not overwrite:
+            raise FileExistsError(f"{index_path} already exists, use overwrite=True to replace it")
+        os.remove(index_path)
+    db = sqlite3.connect(index_path)
+    db.execute(f"CREATE TABLE records ({columns})")
+
+    insert = f"INSERT INTO records VALUES ({', '.join('?' * len(columns.split(',')))})"
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        db.executemany(insert, batch)
+    db.execute(f"CREATE INDEX records_index ON records ({index})")
+    db.commit()
+    return db
+
+@contextmanager
+def open_index(build: Callable[[str], sqlite3.Connection], index_path: str=None):
+    """ The connection of build(index_path), closed at the end.
+        Without index_path the index is built in a temporary directory, deleted at the end.
+    """
+    with tempfile.TemporaryDirectory() if index_path is None else nullcontext() as tmp:
+        db = build(index_path or os.path.join(tmp, "index.sqlite"))
+        try:
+            yield db
+        finally:
+            db.close()
+
+def map_groups(worker: Callable, groups: Iterator, processes: int=None, window: int=1024) -> Iterator:
+    """ worker(group) for every group (in any order) over a process pool,
+        only `window` groups are read at once (bounds the memory).
+        With processes=1 the groups are processed inline, one at a time.
+    """
+    if processes == 1:
+        yield from map(worker, groups)
+        return
+
+    with Pool(processes) as pool:
+        while True:
+            batch = list(itertools.islice(groups, window))
+            if not batch:
+                break
+            yield from pool.imap_unordered(worker, batch)
@@ -0,0 +1,81 @@
+from Crypto.Cipher import AES, ChaCha20_Poly1305, ChaCha20
+from random import randint
+from os import urandom
+import tempfile
+import json
+import os
+
+from Scanner import scan, write_binary_record
+
+def gcm_records(key, nonce, n):
+    records = []
+    for _ in range(n):
+        pt, ad = urandom(randint(16, 64)), urandom(randint(0, 16))
+        cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(ad)
+        ct, tag = cipher.encrypt_and_digest(pt)
+        records.append((nonce, ad, ct, tag, pt))
+    return records
+
+def chacha_records(key, nonce, n):
+    records = []
+    for _ in range(n):
+        pt, ad = urandom(randint(16, 64)), urandom(randint(0, 16))
+        cipher = ChaCha20_Poly1305.new(key=key, nonce=nonce)
+        cipher.update(ad)
+        ct, tag = cipher.encrypt_and_digest(pt)
+        records.append((nonce, ad, ct, tag, None))
+    return records
+
+def test_scan_jsonl():
+    key    = urandom(16)
+    nonces = [urandom(12) for _ in range(3)]
+    records = gcm_records(key, nonces[0], 3) + gcm_records(key, nonces[1], 1) + gcm_records(key, nonces[2], 2)
+    ck, cn = urandom(32), urandom(12)
+    chacha = chacha_records(ck, cn, 3)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        capture, output = os.path.join(tmp, "capture.jsonl"), os.path.join(tmp, "keys.jsonl")
+        with open(capture, "w") as fp:
+            for aead, recs in (("gcm", records), ("chacha", chacha)):
+                for nonce, ad, ct, tag, pt in recs:
+                    rec = {"aead": aead, "nonce": nonce.hex(), "ad": ad.hex(), "ct": ct.hex(), "tag": tag.hex()}
+                    if pt is not None:
+                        rec["pt"] = pt.hex()
+                    fp.write(json.dumps(rec) + "\n")
+
+        assert scan(capture, output, processes=2) == 3, "Wrong number of reused nonces"
+        with open(output) as fp:
+            results = {(res["aead"], res["nonce"]): res for res in map(json.loads, fp)}
+
+    H = AES.new(key, AES.MODE_ECB).encrypt(bytes(16)).hex()
+    for nonce in (nonces[0], nonces[2]):
+        assert H in [h for h, _ in results[("gcm", nonce.hex())]["keys"]], "Failed to recover H"
+
+    rs = ChaCha20.new(key=ck, nonce=cn).encrypt(bytes(32))
+    r  = int.from_bytes(rs[:16], byteorder="little") & 0x0ffffffc0ffffffc0ffffffc0fffffff
+    assert results[("chacha", cn.hex())]["keys"][0][0] == f"{r:032x}", "Failed to recover r"
+    print("Scan JSONL successfully")
+
+def test_scan_binary():
+    key, nonce = urandom(16), urandom(12)
+    records = gcm_records(key, urandom(12), 1) + gcm_records(key, nonce, 2) + gcm_records(key, urandom(12), 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        capture, output = os.path.join(tmp, "capture.bin"), os.path.join(tmp, "keys.jsonl")
+        with open(capture, "wb") as fp:
+            for rec in records:
+                write_binary_record(fp, *rec)
+
+        assert scan(capture, output, aead="gcm", processes=1) == 1, "Wrong number of reused nonces"
+        with open(output) as fp:
+            res = json.loads(fp.readline())
+
+    H = AES.new(key, AES.MODE_ECB).encrypt(bytes(16)).hex()
+    assert res["nonce"] == nonce.hex() and H in [h for h, _ in res["keys"]], "Failed to recover H"
+    assert len(res["keystream"]) > 0, "Failed to recover the keystream"
+    print("Scan binary successfully")
+
+if __name__ == "__main__":
+    test_scan_jsonl()
+    test_scan_binary()
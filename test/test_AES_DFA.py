@@ -0,0 +1,123 @@
+from Crypto.Cipher import AES
+from random import randrange
+from os import urandom
+import tempfile
+
+from Utils import encrypt_block, encrypt_blocks, expand_key, Inv_Sbox, Div1, Div2, Div3
+from DFA import attack_dfa_round9, attack_dfa_round9_stream, attack_dfa_round8, dfa_round8_candidates, dfa_round8_filter
+from DFA import filter_rk10_masks, classify_fault, DFA_COEFFS, FULL_MASK
+
+key = urandom(16)
+pt  = urandom(16)
+ct  = encrypt_block(key, pt)
+
+def faulty_encrypt(n_round):
+    return encrypt_block(key, pt, fault=(n_round, randrange(16), randrange(1, 256)))
+
+def test_reference_aes():
+    for key_size in (16, 24, 32):
+        k   = urandom(key_size)
+        pts = urandom(16 * 1000)
+        assert encrypt_blocks(k, pts) == AES.new(k, AES.MODE_ECB).encrypt(pts), "Wrong reference AES"
+    print("Reference AES is correct")
+
+def test_dfa_round9():
+    assert attack_dfa_round9(lambda: (ct, faulty_encrypt(9))) == key, "Failed to recover the key"
+    print("DFA round 9 successfully")
+
+def filter_rk10_reference(c, f, dfa_indexs, round_key10):
+    # the DFA equations on sets, one rk10 byte at a time
+    div = {1: Div1, 2: Div2, 3: Div3}
+    diff = lambda i, k, factor: div[factor][Inv_Sbox[c[i] ^ k] ^ Inv_Sbox[f[i] ^ k]]
+    diff_cands = []
+    for coeffs in DFA_COEFFS:
+        cand = set(range(256))
+        for i, factor in zip(dfa_indexs, coeffs):
+            cand &= {diff(i, k, factor) for k in range(256)}
+        diff_cands.append(cand)
+    for pos, i in enumerate(dfa_indexs):
+        round_key10[i] &= {k for k in range(256)
+                           if any(diff(i, k, coeffs[pos]) in cand for coeffs, cand in zip(DFA_COEFFS, diff_cands))}
+
+def test_filter_rk10_masks():
+    rk10  = expand_key(key)[10]
+    masks = [FULL_MASK] * 16
+    sets  = [set(range(256)) for _ in range(16)]
+    for _ in range(8):
+        f = faulty_encrypt(9)
+        dfa_indexs = classify_fault(ct, f)
+        filter_rk10_masks(ct, f, dfa_indexs, masks)
+        filter_rk10_reference(ct, f, dfa_indexs, sets)
+        assert masks == [sum(1 << k for k in cands) for cands in sets], "Masks don't match the DFA equations"
+        assert all(masks[i] >> rk10[i] & 1 for i in range(16)), "Lost a byte of the round key"
+    print("Round 9 masks successfully")
+
+def test_dfa_round9_trace():
+    # binary trace file of c || f records, read through mmap
+    faults = [faulty_encrypt(9) for _ in range(64)]
+    with tempfile.NamedTemporaryFile() as fp:
+        fp.write(b"".join(ct + f for f in faults))
+        fp.flush()
+        assert attack_dfa_round9_stream(fp.name) == key, "Failed to recover the key from a trace"
+
+    with tempfile.NamedTemporaryFile() as fp:
+        fp.write(b"".join(ct + f for f in faults[:2]))
+        fp.flush()
+        try:
+            attack_dfa_round9_stream(fp.name)
+            assert False, "Recovered the key from two faults"
+        except ValueError:
+            pass
+    print("DFA round 9 (trace) successfully")
+
+def test_dfa_round9_stream():
+    # a campaign mixing round-9 faults with unusable ones (round 8 faults, garbage)
+    n   = 256
+    pts = pt * n
+    rnd = encrypt_blocks(key, pts, fault=(9, [randrange(16) for _ in range(n)], list(urandom(n))))
+    bad = encrypt_blocks(key, pts, fault=(8, [randrange(16) for _ in range(n)], list(urandom(n))))
+    faults = []
+    for i in range(0, 16 * n, 16):
+        faults += [(ct, rnd[i:i+16]), (ct, bad[i:i+16]), (ct, urandom(16))]
+    assert attack_dfa_round9_stream(faults) == key, "Failed to recover the key"
+
+    try:
+        attack_dfa_round9_stream(faults[:3])
+        assert False, "Recovered the key from a single fault"
+    except ValueError:
+        pass
+    print("DFA round 9 (stream) successfully")
+
+def test_dfa_round8():
+    faults = [(ct, faulty_encrypt(8)) for _ in range(2)]
+    assert attack_dfa_round8(faults, pt, ct, processes=2) == key, "Failed to recover the key"
+    print("DFA round 8 successfully")
+
+def test_dfa_round8_single_fault():
+    # a fault at byte (col, row) of round 8 lands in column (col - row) % 4 of round 9 with the MixColumns column `row`
+    index = randrange(16)
+    f     = encrypt_block(key, pt, fault=(8, index, randrange(1, 256)))
+    col, row = index // 4, index % 4
+    blocks = dict(dfa_round8_candidates([(ct, f)]))
+    rk10s  = dfa_round8_filter(ct, f, (col - row) % 4, blocks[(col - row) % 4], row)
+    assert expand_key(key)[10] in [bytes(rk10) for rk10 in rk10s], "Lost the round key"
+    assert len(rk10s) < 2**12, "Inter-column filter too weak"
+
+    # the whole attack, without the position nor the value of the fault
+    assert attack_dfa_round8([(ct, f)], pt, ct, processes=1) == key, "Failed to recover the key from one fault"
+
+    try:
+        attack_dfa_round8([], pt, ct)
+        assert False, "Attacked without any fault"
+    except ValueError:
+        pass
+    print("DFA round 8 (single fault) successfully")
+
+if __name__ == "__main__":
+    test_reference_aes()
+    test_dfa_round9()
+    test_filter_rk10_masks()
+    test_dfa_round9_trace()
+    test_dfa_round9_stream()
+    test_dfa_round8()
+    test_dfa_round8_single_fault()
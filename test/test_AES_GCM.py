@@ -2,7 +2,10 @@ from os import urandom
 from Crypto.Cipher import AES
 from random import randint
 
-from Attack import forgery_message, forgery_tag
+from Attack import forgery_message, forgery_tag, forgery_tags, get_session, nonce_reuse_many
+import Attack
+from Utils import ghash_int, GHash, GHashPowers, file_chunks
+import tempfile
 
 nonce = urandom(12)
 key   = urandom(16)
@@ -17,6 +20,62 @@ def decrypt(ct, tag, ad=b""):
     cipher.update(ad)
     return cipher.decrypt_and_verify(ct, tag)
 
+def test_ghash_int():
+    ecb = AES.new(key, AES.MODE_ECB)
+    H   = int.from_bytes(ecb.encrypt(bytes(16)), byteorder="big")
+    E0  = int.from_bytes(ecb.encrypt(nonce + b"\x00\x00\x00\x01"), byteorder="big")
+    for _ in range(10):
+        m = urandom(randint(0, 100))
+        a = urandom(randint(0, 32))
+        c, t = encrypt(m, a)
+        assert (ghash_int(H, a, c) ^ E0).to_bytes(16, byteorder="big") == t, "Wrong GHASH"
+    print("GHASH successfully")
+
+def test_ghash_stream():
+    ecb = AES.new(key, AES.MODE_ECB)
+    H   = int.from_bytes(ecb.encrypt(bytes(16)), byteorder="big")
+    E0  = int.from_bytes(ecb.encrypt(nonce + b"\x00\x00\x00\x01"), byteorder="big")
+    a   = urandom(randint(0, 32))
+    c, t = encrypt(urandom(randint(1000, 2000)), a)
+
+    hasher, i = GHash(H, a), 0
+    while i < len(c):
+        j = i + randint(0, 40)
+        hasher.update(c[i:j])
+        i = j
+    assert (hasher.finalize() ^ E0).to_bytes(16, byteorder="big") == t, "Wrong streaming GHASH"
+
+    with tempfile.NamedTemporaryFile() as fp:
+        fp.write(c)
+        fp.flush()
+        hasher = GHash(H, a)
+        for chunk in file_chunks(fp.name, chunk_size=100):
+            hasher.update(chunk)
+        assert (hasher.finalize() ^ E0).to_bytes(16, byteorder="big") == t, "Wrong mmap GHASH"
+    print("Streaming GHASH successfully")
+
+def test_ghash_powers():
+    H = int.from_bytes(AES.new(key, AES.MODE_ECB).encrypt(bytes(16)), byteorder="big")
+    powers   = GHashPowers(H, max_blocks=8)
+    messages = [(urandom(randint(0, 32)), urandom(randint(0, 200))) for _ in range(50)]
+    assert powers.ghash_many(messages) == [ghash_int(H, a, c) for a, c in messages], "Wrong GHASH with powers"
+    assert len(powers.tables) <= 8, "Too many tables of the powers of H"
+    print("GHASH with powers successfully")
+
+def test_nonce_reuse_many():
+    H = int.from_bytes(AES.new(key, AES.MODE_ECB).encrypt(bytes(16)), byteorder="big")
+    messages = []
+    for _ in range(4):
+        a = urandom(randint(0, 32))
+        c, t = encrypt(urandom(randint(30, 100)), a)
+        messages.append((c, a, t))
+
+    assert H in nonce_reuse_many(messages[:2]), "Failed to recover H from two messages"
+    # the GCD of the differences leaves a single candidate
+    assert nonce_reuse_many(messages[:3]) == [H], "H not narrowed down by three messages"
+    assert nonce_reuse_many(messages) == [H], "H not narrowed down by four messages"
+    print("Nonce reuse (many) successfully")
+
 def test_forgery_message():
     m1 = urandom(randint(30, 100))
     m2 = urandom(randint(30, 100))
@@ -71,7 +130,53 @@ def test_forgery_tag():
     assert success == 1, "Failed to forge tag"
     print("Forged tag successfully")
 
+def test_forgery_tags():
+    c1, t1 = encrypt(urandom(randint(30, 100)))
+    c2, t2 = encrypt(urandom(randint(30, 100)))
+    c3, t3 = encrypt(urandom(randint(30, 100)))
+
+    targets = [(urandom(randint(0, 100)), urandom(randint(0, 32))) for _ in range(50)]
+    all_tags = forgery_tags(
+        known_data=[(None, c1, b"", t1), (None, c2, b"", t2), (None, c3, b"", t3)],
+        targets=targets, processes=2, chunk_size=16
+    )
+
+    assert len(all_tags) == len(targets)
+    for (ct, ad), tags in zip(targets, all_tags):
+        success = 0
+        for tag in tags:
+            try:
+                decrypt(ct, tag, ad)
+                success += 1
+            except ValueError:
+                pass
+        assert success == 1, "Failed to forge tags"
+    print("Forged tags successfully")
+
+def test_session():
+    m1 = urandom(randint(30, 100))
+    c1, t1 = encrypt(m1)
+    c2, t2 = encrypt(urandom(randint(30, 100)))
+    known_data = [(m1, c1, b"", t1), (None, c2, b"", t2)]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        session = get_session(nonce, known_data, cache_dir=cache_dir)
+        assert get_session(nonce, [], cache_dir=cache_dir) is session, "Session not cached"
+
+        # from the disk only
+        Attack._sessions.clear()
+        m3 = urandom(randint(1, 30))
+        c3, tags = forgery_message([], m3, nonce=nonce, cache_dir=cache_dir)
+        assert (c3, True) == (encrypt(m3)[0], encrypt(m3)[1] in tags), "Failed to forge from cache"
+    print("Session successfully")
+
 if __name__ == "__main__":
 
+    test_ghash_int()
+    test_ghash_stream()
+    test_ghash_powers()
+    test_nonce_reuse_many()
     test_forgery_tag()
-    test_forgery_message()
\ No newline at end of file
+    test_forgery_message()
+    test_forgery_tags()
+    test_session()
\ No newline at end of file
@@ -0,0 +1,62 @@
+from os import urandom
+from random import randint
+
+from GF128 import from_gcm, to_gcm, gf_mul, gf_sqr, gf_inv, poly_divmod, poly_gcd, poly_roots
+from Utils import gf128_mul
+
+rand = lambda: int.from_bytes(urandom(16), "big")
+
+def poly_mul(f: list, g: list) -> list:
+    res = [0] * (len(f) + len(g) - 1)
+    for i, a in enumerate(f):
+        for j, b in enumerate(g):
+            res[i + j] ^= gf_mul(a, b)
+    return res
+
+def from_roots(roots: list) -> list:
+    f = [1]
+    for r in roots:
+        f = poly_mul(f, [r, 1]) # h + r
+    return f
+
+def test_gf128_mul():
+    for _ in range(100):
+        a, b = rand(), rand()
+        assert gf_mul(from_gcm(a), from_gcm(b)) == from_gcm(gf128_mul(a, b)), "Wrong multiplication"
+        assert to_gcm(from_gcm(a)) == a
+        assert gf_sqr(from_gcm(a)) == from_gcm(gf128_mul(a, a)), "Wrong squaring"
+    print("GF(2^128) multiplication successfully")
+
+def test_gf128_inv():
+    for _ in range(100):
+        a = rand() or 1
+        assert gf_mul(a, gf_inv(a)) == 1, "Wrong inverse"
+    assert gf_inv(1) == 1
+    print("GF(2^128) inverse successfully")
+
+def test_poly_gcd():
+    common = [rand() for _ in range(2)]
+    f = from_roots(common + [rand() for _ in range(randint(1, 5))])
+    g = from_roots(common + [rand() for _ in range(randint(1, 5))])
+    assert poly_gcd(f, g) == from_roots(common), "Wrong GCD"
+    assert poly_gcd([], g) == g and poly_gcd(f, f) == f
+
+    q, r = poly_divmod(f, from_roots(common))
+    assert r == [] and poly_mul(q, from_roots(common)) == f, "Wrong division"
+    print("GF(2^128)[h] GCD successfully")
+
+def test_poly_roots():
+    roots = [rand() for _ in range(6)]
+    assert sorted(poly_roots(from_roots(roots))) == sorted(roots), "Wrong roots"
+    # (h^2 + h + c) with Tr(c) = 1 has no root: multiply it to get a polynomial with extra non-linear factors
+    c = 1 << 127 # x^127 has trace 1 for the GCM modulus
+    f = poly_mul(from_roots(roots[:3]), [c, 1, 1])
+    assert sorted(poly_roots(f)) == sorted(roots[:3]), "Wrong roots with an irreducible factor"
+    assert poly_roots(from_roots(roots[:1])) == roots[:1] and poly_roots([c, 1, 1]) == []
+    print("GF(2^128)[h] roots successfully")
+
+if __name__ == "__main__":
+    test_gf128_mul()
+    test_gf128_inv()
+    test_poly_gcd()
+    test_poly_roots()
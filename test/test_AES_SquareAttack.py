@@ -0,0 +1,29 @@
+from os import urandom
+
+from Utils import encrypt_block, encrypt_blocks, expand_key
+from SquareAttack import attack, attack_5_rounds, SQUARE5_COLUMNS
+
+key = urandom(16)
+queries = 0
+
+def encrypt(pt):
+    global queries
+    queries += 1
+    return encrypt_block(key, pt, n_rounds=4)
+
+def test_square_attack():
+    assert encrypt(bytes(16)) == encrypt_blocks(key, bytes(16), n_rounds=4)
+    assert attack(encrypt) == key, "Failed to recover the key"
+    print(f"Square attack successfully ({queries} queries)")
+
+def test_square_attack_5_rounds():
+    # the rk5 bytes are searched among 4 values around the right ones, k4 over all 256 values
+    rk5   = expand_key(key, 5)[5]
+    space = [[[(rk5[i] + d) % 256 for d in (-2, -1, 0, 1)] for i in pattern] for pattern in SQUARE5_COLUMNS]
+    encrypt5 = lambda pt: encrypt_block(key, pt, n_rounds=5)
+    assert attack_5_rounds(encrypt5, processes=1, search_space=space) == key, "Failed to recover the key"
+    print("Square attack (5 rounds) successfully")
+
+if __name__ == "__main__":
+    test_square_attack()
+    test_square_attack_5_rounds()
@@ -0,0 +1,45 @@
+from Crypto.Cipher import AES
+from os import urandom
+import numpy as np
+
+from Utils import expand_key, expand_keys, reverse_keys, verify_keys, recover_keys, N_ROUNDS
+
+def last_round_keys(key: bytes) -> bytes:
+    # the last `len(key)` bytes of the expanded key, what `reverse_keys` inverts
+    return b"".join(expand_key(key))[-len(key):]
+
+def test_reverse_keys():
+    for key_size in (16, 24, 32):
+        keys = [urandom(key_size) for _ in range(64)]
+        rks  = b"".join(last_round_keys(k) for k in keys)
+        assert [bytes(k) for k in reverse_keys(rks, N_ROUNDS[key_size], key_size)] == keys, "Wrong key schedule inversion"
+
+        round_keys = expand_keys(b"".join(keys), key_size)
+        assert all(
+            round_keys[r].tobytes() == b"".join(expand_key(k)[r] for k in keys) for r in range(N_ROUNDS[key_size] + 1)
+        ), "Wrong batch key schedule"
+    print("Reverse keys successfully")
+
+def test_verify_keys():
+    for key_size in (16, 24, 32):
+        key = urandom(key_size)
+        pt  = urandom(16)
+        ct  = AES.new(key, AES.MODE_ECB).encrypt(pt)
+        keys = np.frombuffer(urandom(key_size * 15) + key, dtype=np.uint8).reshape(-1, key_size)
+        assert verify_keys(keys, pt, ct, key_size).tolist() == [False] * 15 + [True], "Wrong key verification"
+    print("Verify keys successfully")
+
+def test_recover_keys():
+    for key_size in (16, 24, 32):
+        key = urandom(key_size)
+        pt  = urandom(16)
+        ct  = AES.new(key, AES.MODE_ECB).encrypt(pt)
+        rks = urandom(key_size * 100) + last_round_keys(key) + urandom(key_size * 100)
+        assert recover_keys(rks, N_ROUNDS[key_size], key_size, pt, ct, processes=2, chunk_size=64) == [key], "Failed to recover the key"
+        assert len(recover_keys(rks, N_ROUNDS[key_size], key_size, chunk_size=64, processes=1)) == 201
+    print("Recover keys successfully")
+
+if __name__ == "__main__":
+    test_reverse_keys()
+    test_verify_keys()
+    test_recover_keys()
@@ -1,8 +1,11 @@
-from Crypto.Cipher import ChaCha20_Poly1305
+from Crypto.Cipher import ChaCha20_Poly1305, ChaCha20
 from random import randint
 from os import urandom
+import tempfile
 
-from Attack import forgery_tag, forgery_message
+from Attack import forgery_tag, forgery_message, get_session, nonce_reuse_many
+import Attack
+from Utils import chacha_poly1305_tag, poly1305_many, construct_chacha_poly1305_auth_msg
 
 nonce = urandom(12)
 key   = urandom(32)
@@ -17,6 +20,31 @@ def decrypt(ct, ad, tag):
     cipher.update(data=ad)
     return cipher.decrypt_and_verify(ct, tag)
 
+def test_poly1305_many():
+    # the one-time Poly1305 key is the first 32 bytes of the ChaCha20 keystream (block counter 0)
+    rs   = ChaCha20.new(key=key, nonce=nonce).encrypt(bytes(32))
+    msgs = [(urandom(randint(0, 300)), urandom(randint(0, 32))) for _ in range(20)]
+    ref  = [encrypt(m, ad) for m, ad in msgs]
+    for (ct, tag), (_, ad) in zip(ref, msgs):
+        assert chacha_poly1305_tag(rs, [ct[:17], ct[17:]], ad) == tag, "Wrong Poly1305 tag"
+    auth_msgs = [construct_chacha_poly1305_auth_msg(ct, ad) for (ct, _), (_, ad) in zip(ref, msgs)]
+    assert poly1305_many(auth_msgs, rs) == [tag for _, tag in ref], "Wrong batch Poly1305 tags"
+    print("Poly1305 successfully")
+
+def test_nonce_reuse_many():
+    rs = ChaCha20.new(key=key, nonce=nonce).encrypt(bytes(32))
+    r  = int.from_bytes(rs[:16], byteorder='little') & 0x0ffffffc0ffffffc0ffffffc0fffffff
+    s  = int.from_bytes(rs[16:], byteorder='little')
+
+    messages = []
+    for _ in range(3):
+        ad = urandom(randint(0, 32))
+        ct, tag = encrypt(urandom(randint(100, 300)), ad)
+        messages.append((ct, ad, tag))
+    assert nonce_reuse_many(messages) == [(r, s)], "Failed to recover (r, s)"
+    assert nonce_reuse_many(messages, processes=2) == [(r, s)], "Failed to recover (r, s) over a pool"
+    print("Recover (r, s) successfully")
+
 def test_forgery_message():
     m1 = urandom(randint(30, 100))
     m2 = urandom(randint(30, 100))
@@ -61,6 +89,26 @@ def test_forgery_tag():
     assert decrypt(c3, a3, t3) == m3, "Failed to forgery tag"
     print("Forgery tag successfully")
 
+def test_session():
+    m1 = urandom(randint(30, 100))
+    c1, t1 = encrypt(m1, b"")
+    c2, t2 = encrypt(urandom(randint(30, 100)), b"")
+    known_data = [(m1, c1, b"", t1), (None, c2, b"", t2)]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        session = get_session(nonce, known_data, cache_dir=cache_dir)
+        assert get_session(nonce, [], cache_dir=cache_dir) is session, "Session not cached"
+
+        # from the disk only
+        Attack._sessions.clear()
+        m3 = urandom(randint(1, 30))
+        c3, t3 = forgery_message([], m3, nonce=nonce, cache_dir=cache_dir)
+        assert decrypt(c3, b"", t3) == m3, "Failed to forge from cache"
+    print("Session successfully")
+
 if __name__ == "__main__":
+    test_poly1305_many()
+    test_nonce_reuse_many()
     test_forgery_tag()
-    test_forgery_message()
\ No newline at end of file
+    test_forgery_message()
+    test_session()
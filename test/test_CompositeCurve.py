@@ -1,6 +1,6 @@
 from sage.all import *
 
-from CompositeCurve import inverse_point, dlog_point
+from CompositeCurve import inverse_point, dlog_point, CompositeCurve, dlog_many
 
 def gen_composite_curve():
     # generate a composite curve
@@ -40,6 +40,39 @@ def test_dlog_point():
     assert e == x%mod, "Discrete logarithm calculation failed"
     print("Discrete logarithm calculation passed")
 
+def test_composite_curve_many():
+    G, E, p, q = gen_composite_curve()
+    C = CompositeCurve(E, p, q)
+
+    multipliers = [random_prime(2**64) for _ in range(5)]
+    assert C.inverse_point_many(multipliers, [G * m for m in multipliers]) == [G] * 5, "Batch inverse point failed"
+
+    for order, F in zip(C.base_orders(G), C.base_factorizations(G)):
+        assert prod(l**e for l, e in F) == order, "Wrong factorization of the order of G"
+
+    xs = [getrandbits(64) for _ in range(5)]
+    for x, (e, mod) in zip(xs, C.dlog_many([G * x for x in xs], G)):
+        assert e == x % mod, "Batch discrete logarithm failed"
+    print("Batch composite curve passed")
+
+def test_dlog_many_multi_prime():
+    primes = [random_prime(2**24) for _ in range(3)]
+    E = EllipticCurve(Zmod(prod(primes)), [getrandbits(64), getrandbits(64)])
+    x = getrandbits(64)
+    while True:
+        try:
+            G = E.lift_x(x)
+            break
+        except:
+            x += 1
+
+    xs = [getrandbits(64) for _ in range(3)]
+    for x, (e, mod) in zip(xs, dlog_many([G * x for x in xs], G, E, *primes, processes=2)):
+        assert e == x % mod, "Multi-prime discrete logarithm failed"
+    print("Multi-prime discrete logarithm passed")
+
 if __name__ == "__main__":
     test_inverse_point()
-    test_dlog_point()
\ No newline at end of file
+    test_dlog_point()
+    test_composite_curve_many()
+    test_dlog_many_multi_prime()
\ No newline at end of file
@@ -1,7 +1,53 @@
-from SignatureForgery import attack
+from SignatureForgery import attack, scan, build_index, write_binary_record
+from Utils import Ed25519, EdDSA, Helper
 import ed25519 # pip install ed25519
+import tempfile
+import json
 import os
 
+def test_scan_shared_r():
+    keypairs = [EdDSA.create_keypair() for _ in range(3)]
+    records  = []
+    for keypair in keypairs:
+        for _ in range(2):
+            message = os.urandom(16)
+            records.append((message, keypair[32:], EdDSA.sign_message(message, keypair[:32], keypair[32:])))
+
+    # the same message signed with the first key under its public key and a fake one
+    sk, vk  = keypairs[0][:32], keypairs[0][32:]
+    fake_vk = os.urandom(32)
+    message = b"admin=False"
+    for key in (vk, fake_vk, vk):
+        records.append((message, key, EdDSA.sign_message(message, sk, key)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus, output = os.path.join(tmp, "corpus.bin"), os.path.join(tmp, "keys.jsonl")
+        with open(corpus, "wb") as fp:
+            for rec in records:
+                write_binary_record(fp, *rec)
+
+        assert scan(corpus, output, processes=2) == 1, "Wrong number of shared R"
+        with open(output) as fp:
+            res = json.loads(fp.readline())
+        assert sorted(os.listdir(tmp)) == ["corpus.bin", "keys.jsonl"], "Index left on disk"
+
+        # an existing index is only replaced when asked
+        index_path = os.path.join(tmp, "index.sqlite")
+        with open(index_path, "w") as fp:
+            fp.write("not an index")
+        try:
+            build_index(corpus, index_path)
+            assert False, "Existing file overwritten"
+        except FileExistsError:
+            pass
+        build_index(corpus, index_path, overwrite=True).close()
+        assert scan(corpus, output, index_path=index_path, processes=1, overwrite=True) == 1
+
+    a = EdDSA.bytes_to_clamped_scalar(Helper.HASH(sk)[:32])
+    assert res["R"] == records[-1][2][:32].hex() and res["vks"] == 2
+    assert res["keys"] == [[vk.hex(), f"{a % Ed25519.q:064x}"]], "Failed to recover the scalar"
+    print("Scan shared R successfully")
+
 if __name__ == "__main__":
     # setup context
     key, _ = ed25519.create_keypair()
@@ -20,4 +66,6 @@ if __name__ == "__main__":
         ed25519.VerifyingKey(vk).verify(forged_sig, target_message)
         print("The signature is valid")
     except ed25519.BadSignatureError:
-        print("The signature is invalid")
\ No newline at end of file
+        print("The signature is invalid")
+
+    test_scan_shared_r()
@@ -0,0 +1,160 @@
+from Utils import Ed25519, EdDSA, Helper
+from random import getrandbits, shuffle
+import ed25519 # pip install ed25519
+import tempfile
+import os
+
+EDGE_SCALARS = [0, 1, 2, 3, 15, 16, 17, 31, 32, Ed25519.q - 1, Ed25519.q, Ed25519.q + 1, 8 * Ed25519.q - 1]
+
+def double_and_add(P, n):
+    # reference: one affine addition per bit
+    R, Q = (0, 1), P
+    while n:
+        if n & 1:
+            R = Ed25519.add(R, Q)
+        Q = Ed25519.add(Q, Q)
+        n >>= 1
+    return R
+
+def test_mult_extended():
+    P = Ed25519.base_mult(getrandbits(252))
+    for n in EDGE_SCALARS + [getrandbits(256) for _ in range(10)]:
+        assert Ed25519.mult(P, n) == double_and_add(P, n), "Wrong wNAF multiplication"
+
+    # public keys of another implementation are a * BASE
+    for _ in range(5):
+        sk, vk = ed25519.create_keypair()
+        a = EdDSA.bytes_to_clamped_scalar(Helper.HASH(sk.to_seed())[:32])
+        assert Helper.EncodePoint(*Ed25519.mult(Ed25519.BASE, a)) == vk.to_bytes(), "Wrong public key"
+    print("wNAF multiplication successfully")
+
+def test_mult_weierstrass():
+    try:
+        import sage.all
+    except ImportError:
+        print("Sage is not installed, skip the Weierstrass reference")
+        return
+
+    P = Ed25519.base_mult(getrandbits(252))
+    for n in EDGE_SCALARS + [getrandbits(256) for _ in range(10)]:
+        if n % Ed25519.q == 0:
+            continue # the point at infinity has no affine Weierstrass coordinates
+        assert Ed25519.mult(P, n) == Ed25519.mult_weierstrass(P, n), "wNAF doesn't match Sage"
+    print("wNAF vs Weierstrass successfully")
+
+def test_base_mult():
+    assert Ed25519.base_mult(0) == (0, 1), "0 * BASE is not the identity"
+    assert Ed25519.base_mult(Ed25519.q) == (0, 1), "q * BASE is not the identity"
+    assert Ed25519.base_mult(1) == Ed25519.BASE
+    for k in EDGE_SCALARS + [getrandbits(512) for _ in range(5)] + [2**512 - 1]:
+        assert Ed25519.base_mult(k) == Ed25519.mult(Ed25519.BASE, k), "Wrong fixed-base multiplication"
+
+    # the table persisted on disk gives the same results
+    table = Ed25519.base_table()
+    with tempfile.TemporaryDirectory() as tmp:
+        Ed25519.BASE_TABLE_PATH, Ed25519._BASE_TABLE = os.path.join(tmp, "base.json"), None
+        try:
+            Ed25519.base_table()
+            Ed25519._BASE_TABLE = None
+            assert Ed25519.base_table() == table, "Wrong persisted table"
+        finally:
+            Ed25519.BASE_TABLE_PATH, Ed25519._BASE_TABLE = None, table
+    print("Fixed-base multiplication successfully")
+
+def msm_reference(scalars, points):
+    R = Ed25519.IDENTITY
+    for k, P in zip(scalars, points):
+        R = Ed25519.add_extended(R, Ed25519.mult_extended(P, k))
+    return Ed25519.to_affine(R)
+
+def test_msm():
+    for n in (1, 20, Ed25519.STRAUS_MAX + 10):
+        points  = [Ed25519.to_extended(Ed25519.base_mult(getrandbits(252))) for _ in range(n)]
+        scalars = [getrandbits(253) for _ in range(n)]
+        scalars[0] = 0
+        expected = msm_reference(scalars, points)
+        assert Ed25519.to_affine(Ed25519._msm_straus(scalars, points)) == expected, "Wrong Straus MSM"
+        assert Ed25519.to_affine(Ed25519._msm_pippenger(scalars, points)) == expected, "Wrong Pippenger MSM"
+        assert Ed25519.to_affine(Ed25519.msm(scalars, points)) == expected, "Wrong MSM"
+    print("MSM successfully")
+
+def undecodable() -> bytes:
+    while True:
+        s = os.urandom(32)
+        if Helper.DecodePoints([s])[0] is None:
+            return s
+
+def sign_with_torsion(message: bytes, keypair: bytes) -> bytes:
+    # R + T with T of order 2: only valid for the cofactored rule
+    a = EdDSA.bytes_to_clamped_scalar(Helper.HASH(keypair[:32])[:32])
+    r = getrandbits(252)
+    R = Helper.EncodePoint(*Ed25519.add(Ed25519.base_mult(r), (0, Ed25519.p - 1)))
+    h = int.from_bytes(Helper.HASH(R + keypair[32:] + message), 'little')
+    return R + ((r + h * a) % Ed25519.q).to_bytes(32, 'little')
+
+def test_verify_batch():
+    keypairs = [EdDSA.create_keypair() for _ in range(3)]
+    cases    = [] # (signature, message, vk, valid)
+    for i in range(20):
+        keypair = keypairs[i % 3]
+        message = os.urandom(16)
+        cases.append((EdDSA.sign_message(message, keypair[:32], keypair[32:]), message, keypair[32:], True))
+        ed25519.VerifyingKey(keypair[32:]).verify(cases[-1][0], message)
+
+    keypair = keypairs[0]
+    sk, vk  = keypair[:32], keypair[32:]
+    message = os.urandom(16)
+    signature = EdDSA.sign_message(message, sk, vk)
+    S = int.from_bytes(signature[32:], 'little')
+    cases += [
+        (signature, message + b"!", vk, False),                                     # forged message
+        (EdDSA.sign_message(message, sk, keypairs[1][32:]), message, vk, False),    # signed for another key
+        (os.urandom(64), message, vk, False),                                       # random
+        (undecodable() + signature[32:], message, vk, False),                       # undecodable R
+        (signature, message, undecodable(), False),                                 # undecodable key
+        (signature[:32] + (S + Ed25519.q).to_bytes(32, 'little'), message, vk, False), # S >= q
+        (sign_with_torsion(message, keypair), message, vk, True),                   # small order component
+    ]
+    shuffle(cases)
+
+    signatures, messages, vks, expected = map(list, zip(*cases))
+    assert [EdDSA.verify_signature(*case[:3]) for case in cases] == expected, "Wrong single verification"
+    assert EdDSA.verify_batch(signatures, messages, vks) == expected, "Wrong batch verification"
+    print("Batch verification successfully")
+
+def decode_reference(s: bytes):
+    t = int.from_bytes(s, 'little')
+    y = t & ((1 << 255) - 1)
+    if y >= Ed25519.p:
+        return None
+    x = Ed25519.xRecover(y)
+    if not Ed25519.isOnCurve(x, y) or (x == 0 and t >> 255):
+        return None
+    return (Ed25519.p - x if (x & 1) != (t >> 255) else x, y)
+
+def test_decode_points():
+    points    = [Ed25519.base_mult(getrandbits(252)) for _ in range(20)]
+    encodings = [Helper.EncodePoint(*P) for P in points]
+    assert Helper.DecodePoints(encodings) == points, "Wrong decoding"
+    assert Helper.DecodePoints(encodings) == points, "Wrong cached decoding"
+
+    invalid = [
+        (Ed25519.p + 1).to_bytes(32, 'little'),                 # y = 1, not canonical
+        (2**255 - 1).to_bytes(32, 'little'),                    # y > p
+        (1 + 2**255).to_bytes(32, 'little'),                    # x = 0 with the sign bit
+        (Ed25519.p - 1 + 2**255).to_bytes(32, 'little'),        # same for y = -1
+    ]
+    assert Helper.DecodePoints(invalid) == [None] * len(invalid), "Invalid encodings decoded"
+
+    randoms = [os.urandom(32) for _ in range(100)]
+    assert Helper.DecodePoints(randoms) == [decode_reference(s) for s in randoms], "Wrong decoding of random bytes"
+    assert None in Helper.DecodePoints(randoms), "Half of the random encodings are not on the curve"
+    print("Decode points successfully")
+
+if __name__ == "__main__":
+    test_mult_extended()
+    test_mult_weierstrass()
+    test_base_mult()
+    test_msm()
+    test_verify_batch()
+    test_decode_points()
@@ -1,5 +1,6 @@
 from Crack import *
 from Utils import XorShift128
+from math import floor
 import random
 
 if __name__ == "__main__":
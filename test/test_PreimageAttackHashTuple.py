@@ -1,10 +1,27 @@
-from PreimageAttackHashTuple import PyTupleHashPreimageAttack
+from PreimageAttackHashTuple import PyTupleHashPreimageAttack, PyTupleHashBulk, PyTupleHashPreimages
 from os import urandom
+import numpy as np
 
 def test_PreimageAttackHashTuple():
     h = hash(tuple(urandom(1337)))
     t = PyTupleHashPreimageAttack(h)
     assert hash(t) == h
 
+def test_PyTupleHashBulk():
+    tuples = np.frombuffer(urandom(8 * 3 * 1000), dtype=np.int64).reshape(-1, 3)
+    assert list(PyTupleHashBulk(tuples)) == [hash(tuple(int(x) for x in t)) for t in tuples]
+
+def test_PyTupleHashPreimages():
+    h = hash(tuple(urandom(1337)))
+    preimages = set()
+    for a, b in PyTupleHashPreimages(h, block_size=1 << 12):
+        preimages.update(zip(a.tolist(), b.tolist()))
+        if len(preimages) >= 1000:
+            break
+    assert all(hash(t) == h for t in preimages)
+    assert min(preimages) == PyTupleHashPreimageAttack(h)
+
 if __name__ == "__main__":
-    test_PreimageAttackHashTuple()
\ No newline at end of file
+    test_PreimageAttackHashTuple()
+    test_PyTupleHashBulk()
+    test_PyTupleHashPreimages()
\ No newline at end of file